@@ -0,0 +1,117 @@
+from collections import OrderedDict, namedtuple
+import threading
+
+
+CacheInfo = namedtuple(
+    "CacheInfo",
+    ["hits", "misses", "maxsize", "currsize", "evictions", "maxbytes", "currbytes"],
+)
+
+
+class LRUCache:
+
+    """A dict-like cache that holds at most maxSize items, discarding the
+    least recently used item when it is full. A maxSize of None means the
+    cache is unbounded, a maxSize of 0 disables the cache.
+
+    If sizeFunc is given, it is called with each new value and should return
+    its (estimated) size in bytes. Items are then also discarded when their
+    total size exceeds maxBytes, except for the most recently added item.
+
+    The cache can be shared between threads.
+    """
+
+    def __init__(self, maxSize, maxBytes=None, sizeFunc=None):
+        self.maxSize = maxSize
+        self.maxBytes = maxBytes
+        self.sizeFunc = sizeFunc
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.currentBytes = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        if self.maxSize == 0:
+            return
+        # Compute the size first: if sizeFunc raises, the cache is unchanged
+        size = self.sizeFunc(value) if self.sizeFunc is not None else 0
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = value
+            if self.sizeFunc is not None:
+                self._sizes[key] = size
+                self.currentBytes += size
+            self._evict()
+
+    def resize(self, maxSize, maxBytes=None):
+        """Change the limits of the cache, discarding the least recently used
+        items that don't fit anymore.
+        """
+        with self._lock:
+            self.maxSize = maxSize
+            self.maxBytes = maxBytes
+            if maxSize == 0:
+                self._items.clear()
+                self._sizes.clear()
+                self.currentBytes = 0
+            self._evict()
+
+    def _evict(self):
+        while len(self._items) > 1 and self._isOverBudget():
+            self._remove(next(iter(self._items)))
+            self.evictions += 1
+
+    def _isOverBudget(self):
+        if self.maxSize is not None and len(self._items) > self.maxSize:
+            return True
+        return self.maxBytes is not None and self.currentBytes > self.maxBytes
+
+    def _remove(self, key):
+        del self._items[key]
+        self.currentBytes -= self._sizes.pop(key, 0)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.currentBytes = 0
+
+    def cacheInfo(self):
+        """Return a named tuple with hits, misses, maxsize and currsize
+        fields, like functools.lru_cache's cache_info(), as well as
+        evictions, maxbytes and currbytes fields.
+        """
+        with self._lock:
+            return CacheInfo(
+                self.hits,
+                self.misses,
+                self.maxSize,
+                len(self._items),
+                self.evictions,
+                self.maxBytes,
+                self.currentBytes,
+            )
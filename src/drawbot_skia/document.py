@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
-from contextlib import contextmanager
+from contextlib import ExitStack, contextmanager
+import functools
 import logging
 import os
 import pathlib
-import tempfile
+import threading
 import skia
 
 
@@ -37,6 +38,16 @@ class Document(ABC):
     def saveImage(self, path, **kwargs):
         ...
 
+    @contextmanager
+    def drawing(self):
+        from .drawing import Drawing
+
+        drawing = Drawing(self)
+        try:
+            yield drawing
+        finally:
+            drawing.endDrawing()
+
 
 DEFAULT_FRAMEDURATION = 1 / 10
 
@@ -73,100 +84,866 @@ class RecordingDocument(Document):
     def setFrameDuration(self, duration):
         self._currentFrameDuration = duration
 
-    def saveImage(self, path, **kwargs):
+    def saveImage(self, path, workers=None, reuseRepeatedPages=False, **options):
+        """Save the document to a file. See saveImages() for the options."""
+        self.saveImages(
+            [(path, options)], workers=workers, reuseRepeatedPages=reuseRepeatedPages
+        )
+
+    def saveImages(self, targets, workers=None, reuseRepeatedPages=False):
+        """Save the document to several files in one pass over the pages.
+        targets is a list of paths, or of (path, options) tuples, where
+        options is a dict. The options are scale, whiteBackground and
+        tileSize for PNG, scale and quality for JPEG, and scale and codec for
+        MP4. PDF, SVG and SKP targets take no options. If workers is larger
+        than 1, pages are rendered and encoded in that many worker processes.
+        If reuseRepeatedPages is true, pages that are identical to an earlier
+        page, such as the held frames of an animation, are rendered only once.
+        Finding them requires serializing each page, including the fonts it
+        uses, so this only pays off when there are many repeated pages.
+        """
+        sinks = [_makeExportSink(target, len(self._pictures)) for target in targets]
+        pageSinks = [sink for sink in sinks if not sink.ordered]
+        orderedSinks = [sink for sink in sinks if sink.ordered]
+        with ExitStack() as stack:
+            for sink in orderedSinks:
+                stack.enter_context(sink.open(self))
+            exportPage = functools.partial(
+                _exportPage,
+                pageSinks=pageSinks,
+                frameRenderers=[sink.frameRenderer for sink in orderedSinks],
+            )
+            pages = list(enumerate(self._pictures))
+            if reuseRepeatedPages:
+                keys = _pictureFingerprints(self._pictures)
+            else:
+                keys = range(len(self._pictures))
+            exported = _mapUnique(exportPage, pages, keys, workers)
+            for index, (firstIndex, frames) in enumerate(exported):
+                if firstIndex != index:
+                    for sink in pageSinks:
+                        sink.copyPage(firstIndex, index)
+                for sink, frame in zip(orderedSinks, frames):
+                    sink.addPage(self._pictures[index], frame)
+
+    def renderPage(
+        self, index, scale=1, colorType=skia.kRGBA_8888_ColorType, whiteBackground=False
+    ):
+        """Render a page, and return its pixels as a numpy array, which Skia
+        draws into directly. The array has shape (height, width, 4), or
+        (height, width) for single-channel color types, and holds
+        premultiplied pixels. Pixel values may differ by rounding from
+        saveImage() output, which uses the platform's native color type.
+        """
+        return _renderPictureArray(
+            self._pictures[index], scale, colorType, whiteBackground
+        )
+
+    def pageImages(self, **kwargs):
+        """Render the pages one at a time, and yield their pixels as numpy
+        arrays. See renderPage() for the keyword arguments.
+        """
+        for index in range(len(self._pictures)):
+            yield self.renderPage(index, **kwargs)
+
+    @classmethod
+    def fromSKP(cls, path, frameDurations=None):
+        """Create a RecordingDocument from pages that were saved with
+        saveImage() to an .skp file, so they can be exported again without
+        running the script. path is the path that was passed to saveImage().
+        frameDurations can be a single duration for all pages, or a list with
+        a duration for each page. Only load .skp files from trusted sources.
+        """
         path = pathlib.Path(path).resolve()
-        suffix = path.suffix.lower().lstrip(".")
-        methodName = f"_saveImage_{suffix}"
-        method = getattr(self, methodName, None)
-        if method is None:
-            raise ValueError(f"unsupported file type: {suffix}")
-        method(path, **kwargs)
-
-    def _saveImage_pdf(self, path, **kwargs):
-        stream = skia.FILEWStream(os.fspath(path))
-        with skia.PDF.MakeDocument(stream) as document:
-            for picture in self._pictures:
-                x, y, width, height = picture.cullRect()
-                assert x == 0 and y == 0
-                with document.page(width, height) as canvas:
-                    canvas.drawPicture(picture)
+        if path.exists():
+            pagePaths = [path]
+        else:
+            pagePaths = []
+            while _pagePath(path, len(pagePaths)).exists():
+                pagePaths.append(_pagePath(path, len(pagePaths)))
+            if not pagePaths:
+                raise FileNotFoundError(f"no pages found for {path}")
+        if frameDurations is None:
+            frameDurations = DEFAULT_FRAMEDURATION
+        if isinstance(frameDurations, (int, float)):
+            frameDurations = [frameDurations] * len(pagePaths)
+        if len(frameDurations) != len(pagePaths):
+            raise ValueError(
+                f"got {len(frameDurations)} frame durations for {len(pagePaths)} pages"
+            )
+        document = cls()
+        for pagePath in pagePaths:
+            data = skia.Data.MakeFromFileName(os.fspath(pagePath))
+            document._pictures.append(skia.Picture.MakeFromData(data))
+        document._frameDurations = list(frameDurations)
+        return document
+
+
+def _makeExportSink(target, numPages):
+    path, options = _splitExportTarget(target)
+    suffix = path.suffix.lower().lstrip(".")
+    sinkClass = EXPORT_SINKS.get(suffix)
+    if sinkClass is None:
+        raise ValueError(f"unsupported file type: {suffix}")
+    return sinkClass(path, numPages, **options)
+
+
+def _splitExportTarget(target):
+    if isinstance(target, (str, os.PathLike)):
+        path, options = target, {}
+    else:
+        path, options = target
+    return pathlib.Path(path).resolve(), options
+
+
+def _exportPage(index, picture, pageSinks, frameRenderers):
+    # Each (scale, whiteBackground) combination is rendered once, and shared
+    # by all targets that need it
+    with ExitStack() as stack:
+        pixmaps = {}
+
+        def getPixmap(scale, whiteBackground):
+            key = (scale, whiteBackground)
+            if key not in pixmaps:
+                pixmaps[key] = stack.enter_context(
+                    _renderPicture(picture, whiteBackground, scale=scale)
+                )
+            return pixmaps[key]
+
+        for sink in pageSinks:
+            sink.writePage(index, picture, getPixmap)
+        frames = [
+            None if renderer is None else renderer(picture, getPixmap)
+            for renderer in frameRenderers
+        ]
+    return index, frames
+
+
+class _PageFilesSink:
+
+    ordered = False
+
+    def __init__(self, path, numPages):
+        self.path = path
+        self.singlePage = numPages == 1
+
+    def pagePath(self, index):
+        return self.path if self.singlePage else _pagePath(self.path, index)
+
+    def copyPage(self, sourceIndex, index):
+        _copyFile(self.pagePath(sourceIndex), self.pagePath(index))
+
+
+class _PNGSink(_PageFilesSink):
+    def __init__(self, path, numPages, scale=1, whiteBackground=False, tileSize=None):
+        super().__init__(path, numPages)
+        self.scale = scale
+        self.whiteBackground = whiteBackground
+        self.tileSize = tileSize
+
+    def writePage(self, index, picture, getPixmap):
+        if self.tileSize is not None:
+            _saveTiledPNG(
+                picture,
+                self.pagePath(index),
+                self.tileSize,
+                self.scale,
+                self.whiteBackground,
+            )
+            return
+        pixmap = getPixmap(self.scale, self.whiteBackground)
+        _savePixmap(pixmap, self.pagePath(index), skia.kPNG)
+
+
+class _JPEGSink(_PageFilesSink):
+    def __init__(self, path, numPages, scale=1, quality=100, tileSize=None):
+        if tileSize is not None:
+            raise ValueError("tiled export is only supported for PNG")
+        super().__init__(path, numPages)
+        self.scale = scale
+        self.quality = quality
+
+    def writePage(self, index, picture, getPixmap):
+        pixmap = getPixmap(self.scale, True)
+        _savePixmap(pixmap, self.pagePath(index), skia.kJPEG, self.quality)
+
+
+class _SVGSink(_PageFilesSink):
+    def writePage(self, index, picture, getPixmap):
+        _saveSVGImage(picture, self.pagePath(index))
+
+
+class _SKPSink(_PageFilesSink):
+    def writePage(self, index, picture, getPixmap):
+        with _replacingFile(self.pagePath(index)) as path:
+            with open(path, "wb") as f:
+                f.write(memoryview(picture.serialize()))
+
+
+class _PDFSink:
+
+    ordered = True
+    frameRenderer = None
+
+    def __init__(self, path, numPages):
+        self.path = path
+
+    @contextmanager
+    def open(self, document):
+        stream = skia.FILEWStream(os.fspath(self.path))
+        with skia.PDF.MakeDocument(stream) as self.pdfDocument:
+            yield
         stream.flush()
 
-    def _saveImage_svg(self, path, **kwargs):
-        for picture, framePath in _iteratePictures(self._pictures, path):
-            x, y, width, height = picture.cullRect()
-            assert x == 0 and y == 0
-            stream = skia.FILEWStream(os.fspath(framePath))
-            canvas = skia.SVGCanvas.Make((width, height), stream)
+    def addPage(self, picture, frame):
+        x, y, width, height = picture.cullRect()
+        assert x == 0 and y == 0
+        with self.pdfDocument.page(width, height) as canvas:
             canvas.drawPicture(picture)
-            del canvas
-            stream.flush()
 
-    def _saveImage_png(self, path, **kwargs):
-        _savePixelImages(self._pictures, path, skia.kPNG)
 
-    def _saveImage_jpeg(self, path, **kwargs):
-        _savePixelImages(self._pictures, path, skia.kJPEG, whiteBackground=True)
+class _MP4Sink:
 
-    _saveImage_jpg = _saveImage_jpeg
+    ordered = True
+    frameRenderer = None
 
-    def _saveImage_mp4(self, path, codec="libx264", **kwargs):
-        from .ffmpeg import generateMP4
+    def __init__(self, path, numPages, scale=1, codec="libx264"):
+        self.path = path
+        self.scale = scale
+        self.codec = codec
+
+    @contextmanager
+    def open(self, document):
+        from .ffmpeg import openMP4Writer
 
-        if not self._pictures:
+        if not document._pictures:
             # Empty mp4?
+            yield
             return
-        frameRate = max(1, round(1 / self._frameDurations[-1]))
-        if len(set(self._frameDurations)) != 1:
+        frameRate = max(1, round(1 / document._frameDurations[-1]))
+        if len(set(document._frameDurations)) != 1:
             logging.warning("ignoring varying frame durations for mp4 export")
-        with tempfile.TemporaryDirectory(prefix="drawbot-skia-") as tempDir:
-            tempDir = pathlib.Path(tempDir)
-            imagePath = tempDir / "frame.png"
-            _savePixelImages(
-                self._pictures,
-                imagePath,
-                skia.kPNG,
-                whiteBackground=True,
-                singlePage=False,
-            )
-            imagesTemplate = tempDir / "frame_%d.png"
-            generateMP4(imagesTemplate, path, frameRate, codec=codec)
+        x, y, width, height = document._pictures[0].cullRect()
+        width, height = _scaledSize(width, height, self.scale)
+        self.frameRenderer = _MP4FrameRenderer(width, height, self.scale)
+        with openMP4Writer(self.path, width, height, frameRate, self.codec) as writer:
+            self.writeFrame = writer
+            yield
 
+    def addPage(self, picture, frame):
+        self.writeFrame(frame)
 
-def _savePixelImages(pictures, path, format, whiteBackground=False, singlePage=None):
-    for picture, framePath in _iteratePictures(pictures, path, singlePage):
-        _savePixelImage(picture, framePath, format, whiteBackground=whiteBackground)
 
+class _MP4FrameRenderer:
+
+    """Render the frames for _MP4Sink. This is separate from the sink, which
+    holds the pipe to ffmpeg, so it can be sent to worker processes.
+    """
+
+    def __init__(self, width, height, scale):
+        self.width = width
+        self.height = height
+        self.scale = scale
+
+    def __call__(self, picture, getPixmap):
+        pixmap = getPixmap(self.scale, True)
+        if (pixmap.width(), pixmap.height()) == (self.width, self.height):
+            return _rgbaBytes(pixmap)
+        logging.warning("cropping all frames to the size of the first frame")
+        imageInfo = _makeImageInfo(self.width, self.height)
+        with _renderPicture(picture, True, imageInfo, self.scale) as pixmap:
+            return _rgbaBytes(pixmap)
+
+
+EXPORT_SINKS = {
+    "png": _PNGSink,
+    "jpg": _JPEGSink,
+    "jpeg": _JPEGSink,
+    "svg": _SVGSink,
+    "skp": _SKPSink,
+    "pdf": _PDFSink,
+    "mp4": _MP4Sink,
+}
 
-def _iteratePictures(pictures, path, singlePage=None):
-    if singlePage is None:
-        singlePage = len(pictures) == 1
-    for index, picture in enumerate(pictures):
-        if singlePage:
-            framePath = path
-        else:
-            framePath = path.parent / f"{path.stem}_{index}{path.suffix}"
-        yield picture, framePath
 
+def _pictureFingerprints(pictures):
+    """Return a fingerprint of the content of each picture, so pages that
+    are identical, such as the held frames of an animation, can be rendered
+    only once.
+    """
+    import hashlib
 
-def _savePixelImage(picture, path, format, whiteBackground=False):
+    return [
+        hashlib.sha256(memoryview(picture.serialize())).digest() for picture in pictures
+    ]
+
+
+def _mapUnique(func, pages, keys, workers=None):
+    """Like _mapPictures(), but call func only for the first of the pages
+    that have the same key, and yield that result again for the others.
+    Results are kept only until the last page with their key.
+    """
+    firstIndices = {}
+    lastIndices = {}
+    for index, key in enumerate(keys):
+        firstIndices.setdefault(key, index)
+        lastIndices[key] = index
+    uniquePages = [pages[index] for index in firstIndices.values()]
+    uniqueResults = _mapPictures(func, uniquePages, workers)
+    results = {}
+    for index, key in enumerate(keys):
+        if index == firstIndices[key]:
+            results[key] = next(uniqueResults)
+        result = results[key]
+        if index == lastIndices[key]:
+            del results[key]
+        yield result
+
+
+def _copyFile(sourcePath, path):
+    # A repeated page gets a copy of the file of its first occurrence. Hard
+    # links would be cheaper, but a later export to the same paths would then
+    # write into all the linked files at once.
+    import shutil
+
+    with _replacingFile(path) as tempPath:
+        shutil.copyfile(sourcePath, tempPath)
+
+
+@contextmanager
+def _replacingFile(path):
+    """Yield a temporary path next to path to write a file to, and move the
+    file to path when the with block succeeds. This replaces the file at path
+    instead of writing into it, so that other paths that are hard links to
+    the same file are not affected.
+    """
+    path = pathlib.Path(path)
+    tempPath = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        yield tempPath
+        os.replace(tempPath, path)
+    finally:
+        if os.path.lexists(tempPath):
+            os.remove(tempPath)
+
+
+def _mapPictures(func, pages, workers=None):
+    """Call func(index, picture) for each (index, picture) tuple in pages,
+    and yield the results in order. If workers is larger than 1, func is
+    called in that many worker processes, so func and its results must be
+    picklable.
+    """
+    if workers is None or workers <= 1 or len(pages) <= 1:
+        for index, picture in pages:
+            yield func(index, picture)
+        return
+
+    # skia-python holds the GIL while drawing and encoding, so threads can't
+    # render pages in parallel. Pictures can't be pickled, so they are sent
+    # to the worker processes serialized. Only a limited number of pages is
+    # in flight at any time, to bound the memory used by the results.
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    maxPending = 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for index, picture in pages:
+            if len(pending) >= maxPending:
+                yield pending.popleft().result()
+            data = bytes(picture.serialize())
+            pending.append(executor.submit(_callWithPicture, func, index, data))
+        while pending:
+            yield pending.popleft().result()
+
+
+def _callWithPicture(func, index, data):
+    return func(index, skia.Picture.MakeFromData(skia.Data(data)))
+
+
+def _pagePath(path, index):
+    return path.parent / f"{path.stem}_{index}{path.suffix}"
+
+
+def _saveTiledPNG(picture, path, tileSize, scale=1, whiteBackground=False):
+    """Render the picture in horizontal bands of tileSize pixels high, and
+    write them to a PNG file one by one, so that the full image never needs
+    to be in memory. Note that Skia may anti-alias shapes that cross a band
+    edge slightly differently than it would on a single surface.
+    """
+    from .png import PNGWriter
+
+    x, y, width, height = picture.cullRect()
+    assert x == 0 and y == 0
+    width, height = _scaledSize(width, height, scale)
+    with _replacingFile(path) as tempPath:
+        with PNGWriter(os.fspath(tempPath), width, height) as writer:
+            for top in range(0, height, tileSize):
+                bandHeight = min(tileSize, height - top)
+                surface = surfacePool.acquire(_makeImageInfo(width, bandHeight))
+                try:
+                    canvas = surface.getCanvas()
+                    canvas.clear(
+                        skia.ColorWHITE if whiteBackground else skia.ColorTRANSPARENT
+                    )
+                    canvas.save()
+                    canvas.translate(0, -top)
+                    canvas.scale(scale, scale)
+                    canvas.drawPicture(picture)
+                    canvas.restore()
+                    pixels = _rgbaBytes(_peekPixels(surface), skia.kUnpremul_AlphaType)
+                finally:
+                    surfacePool.release(surface)
+                writer.writeRows(pixels)
+
+
+# Color types that can be rendered into a numpy array: (dtype, channels)
+ARRAY_FORMATS = {
+    skia.kRGBA_8888_ColorType: ("uint8", 4),
+    skia.kBGRA_8888_ColorType: ("uint8", 4),
+    skia.kRGBA_F16_ColorType: ("float16", 4),
+    skia.kRGBA_F32_ColorType: ("float32", 4),
+    skia.kAlpha_8_ColorType: ("uint8", 1),
+    skia.kGray_8_ColorType: ("uint8", 1),
+}
+
+
+def _renderPictureArray(picture, scale, colorType, whiteBackground=False):
+    x, y, width, height = picture.cullRect()
+    assert x == 0 and y == 0
+    width, height = _scaledSize(width, height, scale)
+    pixels, imageInfo = _makePixelArray(width, height, colorType)
+    surface = skia.Surface.MakeRasterDirect(imageInfo, pixels, imageInfo.minRowBytes())
+    if surface is None:
+        raise ValueError(f"can't create a {width}x{height} surface")
+    canvas = surface.getCanvas()
+    if whiteBackground or imageInfo.alphaType() == skia.kOpaque_AlphaType:
+        canvas.clear(skia.ColorWHITE)
+    canvas.scale(scale, scale)
+    canvas.drawPicture(picture)
+    return pixels
+
+
+def _imageToArray(image, colorType):
+    pixels, imageInfo = _makePixelArray(image.width(), image.height(), colorType)
+    if not image.readPixels(imageInfo, pixels, imageInfo.minRowBytes()):
+        raise ValueError(f"can't convert the image to {colorType}")
+    return pixels
+
+
+def _makePixelArray(width, height, colorType):
+    import numpy as np
+
+    arrayFormat = ARRAY_FORMATS.get(colorType)
+    if arrayFormat is None:
+        raise ValueError(f"unsupported color type: {colorType}")
+    dtype, numChannels = arrayFormat
+    shape = (height, width) if numChannels == 1 else (height, width, numChannels)
+    if colorType == skia.kGray_8_ColorType:
+        alphaType = skia.kOpaque_AlphaType
+    else:
+        alphaType = skia.kPremul_AlphaType
+    imageInfo = skia.ImageInfo.Make(width, height, colorType, alphaType)
+    return np.zeros(shape, dtype=dtype), imageInfo
+
+
+def _streamingPagePath(path, pageIndex):
+    # Streaming documents don't know in advance whether there will be more
+    # than one page: the first page is saved as path, and renamed to path_0
+    # when the second page starts
+    if pageIndex == 0:
+        return path
+    if pageIndex == 1:
+        os.replace(path, _pagePath(path, 0))
+    return _pagePath(path, pageIndex)
+
+
+def _saveSVGImage(picture, path):
     x, y, width, height = picture.cullRect()
     assert x == 0 and y == 0
-    surface = skia.Surface(int(width), int(height))
-    with surface as canvas:
-        if whiteBackground:
-            canvas.clear(skia.ColorWHITE)
+    with _replacingFile(path) as tempPath:
+        stream = skia.FILEWStream(os.fspath(tempPath))
+        canvas = skia.SVGCanvas.Make((width, height), stream)
+        canvas.drawPicture(picture)
+        del canvas
+        stream.flush()
+        del stream
+
+
+def _savePixmap(pixmap, path, format, quality=100):
+    # Encode the pixels in place, instead of from a snapshot of the surface
+    image = skia.Image.MakeFromRaster(pixmap)
+    with _replacingFile(path) as tempPath:
+        image.save(os.fspath(tempPath), format, quality)
+
+
+@contextmanager
+def _renderPicture(picture, whiteBackground=False, imageInfo=None, scale=1):
+    """Draw the picture on a pooled surface, and yield a skia.Pixmap with
+    the surface's pixels. The pixmap is only valid inside the with block.
+    """
+    if imageInfo is None:
+        x, y, width, height = picture.cullRect()
+        assert x == 0 and y == 0
+        imageInfo = _makeImageInfo(*_scaledSize(width, height, scale))
+    surface = surfacePool.acquire(imageInfo)
+    try:
+        canvas = surface.getCanvas()
+        canvas.clear(skia.ColorWHITE if whiteBackground else skia.ColorTRANSPARENT)
+        canvas.save()
+        canvas.scale(scale, scale)
         canvas.drawPicture(picture)
-    image = surface.makeImageSnapshot()
-    image.save(os.fspath(path), format)
+        canvas.restore()
+        yield _peekPixels(surface)
+    finally:
+        surfacePool.release(surface)
+
+
+# Raster surfaces use the platform's native color type by default, which is
+# not necessarily skia-python's kN32_ColorType. Drawing images may give
+# slightly different results in other color types, so stick to the native one.
+NATIVE_COLOR_TYPE = skia.Surface.MakeRasterN32Premul(1, 1).imageInfo().colorType()
+
+
+def _scaledSize(width, height, scale=1):
+    # The pixel size of a page: all raster output truncates, so that every
+    # way of rendering a page at a given scale gives the same size
+    return int(width * scale), int(height * scale)
+
+
+def _makeImageInfo(width, height):
+    return skia.ImageInfo.Make(width, height, NATIVE_COLOR_TYPE, skia.kPremul_AlphaType)
+
+
+def _rgbaBytes(pixmap, alphaType=skia.kPremul_AlphaType):
+    imageInfo = skia.ImageInfo.Make(
+        pixmap.width(), pixmap.height(), skia.kRGBA_8888_ColorType, alphaType
+    )
+    pixels = bytearray(imageInfo.computeMinByteSize())
+    if not pixmap.readPixels(imageInfo, pixels):
+        raise ValueError("can't convert the pixels to RGBA")
+    return pixels
+
+
+def _peekPixels(surface):
+    pixmap = skia.Pixmap()
+    if not surface.peekPixels(pixmap):
+        raise ValueError("can't access the surface pixels")
+    return pixmap
+
+
+# The pool keeps at most this many bytes of unused surfaces, and doesn't keep
+# surfaces larger than DEFAULT_MAX_POOLED_SURFACE_BYTES at all: reusing a huge
+# surface saves little compared to rendering it, and it would otherwise stay
+# allocated for the rest of the process.
+DEFAULT_SURFACE_POOL_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_POOLED_SURFACE_BYTES = 16 * 1024 * 1024
+
+
+class SurfacePool:
+
+    """A pool of raster surfaces, so that pages with the same size and color
+    type can reuse a surface instead of allocating a new one. Unused surfaces
+    are kept up to a total of maxBytes, discarding the least recently used
+    ones first, and surfaces larger than maxSurfaceBytes are never kept.
+    Surfaces are not cleared by the pool.
+    """
+
+    def __init__(
+        self,
+        maxBytes=DEFAULT_SURFACE_POOL_BYTES,
+        maxSurfaceBytes=DEFAULT_MAX_POOLED_SURFACE_BYTES,
+    ):
+        self.maxBytes = maxBytes
+        self.maxSurfaceBytes = maxSurfaceBytes
+        self.currentBytes = 0
+        # [(key, numBytes, surface), ...], least recently used first
+        self._surfaces = []
+        self._lock = threading.Lock()
+
+    def acquire(self, imageInfo):
+        key = _surfaceKey(imageInfo)
+        with self._lock:
+            for index, (surfaceKey, numBytes, surface) in enumerate(self._surfaces):
+                if surfaceKey == key:
+                    del self._surfaces[index]
+                    self.currentBytes -= numBytes
+                    return surface
+        surface = skia.Surface.MakeRaster(imageInfo)
+        if surface is None:
+            width, height = imageInfo.width(), imageInfo.height()
+            raise ValueError(f"can't create a {width}x{height} surface")
+        return surface
+
+    def release(self, surface):
+        imageInfo = surface.imageInfo()
+        numBytes = imageInfo.computeMinByteSize()
+        if numBytes > min(self.maxSurfaceBytes, self.maxBytes):
+            return
+        with self._lock:
+            self._surfaces.append((_surfaceKey(imageInfo), numBytes, surface))
+            self.currentBytes += numBytes
+            while self.currentBytes > self.maxBytes:
+                key, numBytes, surface = self._surfaces.pop(0)
+                self.currentBytes -= numBytes
+
+    def clear(self):
+        with self._lock:
+            self._surfaces.clear()
+            self.currentBytes = 0
+
+    def __len__(self):
+        return len(self._surfaces)
+
+
+def _surfaceKey(imageInfo):
+    return (
+        imageInfo.width(),
+        imageInfo.height(),
+        imageInfo.colorType(),
+        imageInfo.alphaType(),
+    )
+
+
+surfacePool = SurfacePool()
+
+
+PIXEL_FORMATS = {
+    "png": skia.kPNG,
+    "jpg": skia.kJPEG,
+    "jpeg": skia.kJPEG,
+}
 
 
 class PixelDocument(Document):
-    ...
+
+    """A document that rasterizes each page when it is finished, and saves it
+    as a PNG or JPEG file, so pages don't stay in memory. Multiple pages are
+    saved as path_0.png, path_1.png, etc., like RecordingDocument does.
+    """
+
+    def __init__(self, path, whiteBackground=None):
+        self._path = pathlib.Path(path).resolve()
+        self._format = self._getFormat(self._path)
+        if whiteBackground is None:
+            whiteBackground = self._format == skia.kJPEG
+        self._whiteBackground = whiteBackground
+        self._surface = None
+        self._pageIndex = 0
+        self.pageWidth = self.pageHeight = None
+
+    @property
+    def isDrawing(self):
+        return self._surface is not None
+
+    def beginPage(self, width, height):
+        assert self._surface is None
+        self.pageWidth = width
+        self.pageHeight = height
+        imageInfo = self._makeImageInfo(*_scaledSize(width, height))
+        self._surface = surfacePool.acquire(imageInfo)
+        canvas = self._surface.getCanvas()
+        canvas.clear(
+            skia.ColorWHITE if self._whiteBackground else skia.ColorTRANSPARENT
+        )
+        # The surface goes back to the pool after the page: make sure that any
+        # transformation or clipping done by the page is undone by then
+        canvas.save()
+        return canvas
+
+    def endPage(self):
+        surface = self._surface
+        self._surface = None
+        self.pageWidth = self.pageHeight = None
+        surface.getCanvas().restoreToCount(1)
+        try:
+            self._writePage(_peekPixels(surface))
+        finally:
+            surfacePool.release(surface)
+        self._pageIndex += 1
+
+    def endDrawing(self):
+        if self.isDrawing:
+            self.endPage()
+
+    def setFrameDuration(self, duration):
+        ...
+
+    def saveImage(self, path, **kwargs):
+        raise NotImplementedError()
+
+    def _getFormat(self, path):
+        suffix = path.suffix.lower().lstrip(".")
+        format = PIXEL_FORMATS.get(suffix)
+        if format is None:
+            raise ValueError(f"unsupported file type: {suffix}")
+        return format
+
+    def _makeImageInfo(self, width, height):
+        return _makeImageInfo(width, height)
+
+    def _writePage(self, pixmap):
+        path = _streamingPagePath(self._path, self._pageIndex)
+        _savePixmap(pixmap, path, self._format)
 
 
 class MP4Document(PixelDocument):
-    ...
+
+    """A document that rasterizes each page when it is finished, and pipes
+    it to ffmpeg as a frame of an mp4 file.
+    """
+
+    def __init__(self, path, codec="libx264"):
+        super().__init__(path, whiteBackground=True)
+        self._codec = codec
+        self._imageInfo = None
+        self._mp4Writer = None
+        self._writeFrame = None
+        self._frameDuration = None
+        self._currentFrameDuration = DEFAULT_FRAMEDURATION
+
+    def endPage(self):
+        if self._frameDuration is None:
+            self._frameDuration = self._currentFrameDuration
+        elif self._currentFrameDuration != self._frameDuration:
+            logging.warning("ignoring varying frame durations for mp4 export")
+        self._currentFrameDuration = DEFAULT_FRAMEDURATION
+        super().endPage()
+
+    def endDrawing(self):
+        super().endDrawing()
+        if self._mp4Writer is not None:
+            mp4Writer = self._mp4Writer
+            self._mp4Writer = self._writeFrame = None
+            mp4Writer.__exit__(None, None, None)
+
+    def setFrameDuration(self, duration):
+        self._currentFrameDuration = duration
+
+    def _getFormat(self, path):
+        # The frames are piped to ffmpeg as raw pixels
+        return None
+
+    def _makeImageInfo(self, width, height):
+        if self._imageInfo is None:
+            self._imageInfo = _makeImageInfo(width, height)
+        elif (width, height) != (self._imageInfo.width(), self._imageInfo.height()):
+            logging.warning("cropping all frames to the size of the first frame")
+        return self._imageInfo
+
+    def _writePage(self, pixmap):
+        if self._mp4Writer is None:
+            from .ffmpeg import openMP4Writer
+
+            frameRate = max(1, round(1 / self._frameDuration))
+            self._mp4Writer = openMP4Writer(
+                self._path, pixmap.width(), pixmap.height(), frameRate, self._codec
+            )
+            self._writeFrame = self._mp4Writer.__enter__()
+        self._writeFrame(_rgbaBytes(pixmap))
+
+
+class RasterDocument(Document):
+
+    """A document that draws each page directly into a raster surface,
+    instead of recording it to be rendered later. The finished pages are
+    kept as images, and can be saved as PNG or JPEG files.
+    """
+
+    def __init__(self):
+        self._images = []
+        self._surface = None
+        self.pageWidth = self.pageHeight = None
+
+    @property
+    def isDrawing(self):
+        return self._surface is not None
+
+    def beginPage(self, width, height):
+        assert self._surface is None
+        self.pageWidth = width
+        self.pageHeight = height
+        imageInfo = _makeImageInfo(*_scaledSize(width, height))
+        self._surface = skia.Surface.MakeRaster(imageInfo)
+        canvas = self._surface.getCanvas()
+        canvas.clear(skia.ColorTRANSPARENT)
+        return canvas
+
+    def endPage(self):
+        # The surface is discarded, so the snapshot doesn't copy the pixels
+        self._images.append(self._surface.makeImageSnapshot())
+        self._surface = None
+        self.pageWidth = self.pageHeight = None
+
+    def endDrawing(self):
+        if self.isDrawing:
+            self.endPage()
+
+    def setFrameDuration(self, duration):
+        ...
+
+    def saveImage(self, path, workers=None, reuseRepeatedPages=False, **options):
+        """Save the pages as PNG or JPEG files. See saveImages() for the
+        options.
+        """
+        self.saveImages(
+            [(path, options)], workers=workers, reuseRepeatedPages=reuseRepeatedPages
+        )
+
+    def saveImages(self, targets, workers=None, reuseRepeatedPages=False):
+        """Save the pages to several PNG or JPEG files in one pass, with the
+        same targets and options as RecordingDocument.saveImages(). The pages
+        are only available as pixels, so a scale other than 1 resamples them.
+        """
+        for target in targets:
+            path, options = _splitExportTarget(target)
+            suffix = path.suffix.lower().lstrip(".")
+            if suffix not in PIXEL_FORMATS:
+                raise ValueError(f"unsupported file type: {suffix}")
+        # Export pictures that draw the page images, so that the options are
+        # handled exactly like they are for a RecordingDocument
+        document = RecordingDocument()
+        document._pictures = [_recordImage(image) for image in self._images]
+        document._frameDurations = [DEFAULT_FRAMEDURATION] * len(self._images)
+        document.saveImages(
+            targets, workers=workers, reuseRepeatedPages=reuseRepeatedPages
+        )
+
+    def pageImages(
+        self, scale=1, colorType=skia.kRGBA_8888_ColorType, whiteBackground=False
+    ):
+        """Yield the pixels of the pages as numpy arrays. See
+        RecordingDocument.renderPage() for the arguments and the array format.
+        The pages are only available as pixels, so a scale other than 1
+        resamples them, instead of drawing them at that scale.
+        """
+        for image in self._images:
+            if scale != 1 or whiteBackground:
+                image = _redrawImage(image, scale, whiteBackground)
+            yield _imageToArray(image, colorType)
+
+
+def _recordImage(image):
+    recorder = skia.PictureRecorder()
+    canvas = recorder.beginRecording(image.width(), image.height())
+    paint = skia.Paint()
+    paint.setFilterQuality(skia.kMedium_FilterQuality)
+    canvas.drawImage(image, 0, 0, paint)
+    return recorder.finishRecordingAsPicture()
+
+
+def _redrawImage(image, scale=1, whiteBackground=False):
+    width, height = _scaledSize(image.width(), image.height(), scale)
+    surface = skia.Surface.MakeRaster(_makeImageInfo(width, height))
+    if surface is None:
+        raise ValueError(f"can't create a {width}x{height} surface")
+    canvas = surface.getCanvas()
+    canvas.clear(skia.ColorWHITE if whiteBackground else skia.ColorTRANSPARENT)
+    canvas.scale(scale, scale)
+    paint = skia.Paint()
+    paint.setFilterQuality(skia.kMedium_FilterQuality)
+    canvas.drawImage(image, 0, 0, paint)
+    return surface.makeImageSnapshot()
 
 
 class PDFDocument(Document):
@@ -176,16 +953,6 @@ class PDFDocument(Document):
         self.pageWidth = self.pageHeight = None
         self._isDrawing = False
 
-    @contextmanager
-    def drawing(self):
-        from .drawing import Drawing
-
-        drawing = Drawing(self)
-        try:
-            yield drawing
-        finally:
-            drawing.endDrawing()
-
     @property
     def isDrawing(self):
         return self._isDrawing
@@ -214,4 +981,45 @@ class PDFDocument(Document):
 
 
 class SVGDocument(Document):
-    ...
+
+    """A document that saves each page as an SVG file when it is finished,
+    so pages don't stay in memory. Multiple pages are saved as path_0.svg,
+    path_1.svg, etc., like RecordingDocument does.
+    """
+
+    def __init__(self, path):
+        self._path = pathlib.Path(path).resolve()
+        self._currentRecorder = None
+        self._pageIndex = 0
+        self.pageWidth = self.pageHeight = None
+
+    @property
+    def isDrawing(self):
+        return self._currentRecorder is not None
+
+    def beginPage(self, width, height):
+        # Skia only completes an SVG file when its SVGCanvas is destroyed,
+        # and the Drawing may hold on to the page's canvas for a while, so
+        # record the page, and write it out with a short-lived SVGCanvas
+        assert self._currentRecorder is None
+        self.pageWidth = width
+        self.pageHeight = height
+        self._currentRecorder = skia.PictureRecorder()
+        return self._currentRecorder.beginRecording(width, height)
+
+    def endPage(self):
+        picture = self._currentRecorder.finishRecordingAsPicture()
+        self._currentRecorder = None
+        self.pageWidth = self.pageHeight = None
+        _saveSVGImage(picture, _streamingPagePath(self._path, self._pageIndex))
+        self._pageIndex += 1
+
+    def endDrawing(self):
+        if self.isDrawing:
+            self.endPage()
+
+    def setFrameDuration(self, duration):
+        ...
+
+    def saveImage(self, path, **kwargs):
+        raise NotImplementedError()
@@ -5,7 +5,6 @@ import skia
 from .document import RecordingDocument
 from .errors import DrawbotError
 from .gstate import GraphicsState, GraphicsStateMixin
-from .shaping import alignGlyphPositions
 
 
 DEFAULT_CANVAS_DIMENSIONS = (1000, 1000)
@@ -104,9 +103,6 @@ class Drawing:
         self._canvas.clipPath(path.path, doAntiAlias=True)
 
     def textSize(self, txt):
-        # TODO: with some smartness we can shape only once, for a
-        # textSize()/text() call combination with the same text and
-        # the same text parameters.
         glyphsInfo = self._gstate.textStyle.shape(txt)
         textWidth = glyphsInfo.endPos[0]
         return (textWidth, self._gstate.textStyle.skFont.getSpacing())
@@ -117,42 +113,46 @@ class Drawing:
             return
 
         textStyle = self._gstate.textStyle
-        glyphsInfo = textStyle.shape(txt)
-        alignGlyphPositions(glyphsInfo, align)
-
         x, y = position
 
         with self._savedCanvasState():
             self._canvas.translate(x, y)
             if self._flipCanvas:
                 self._canvas.scale(1, -1)
-            if "COLR" not in textStyle.ttFont:
-                builder = skia.TextBlobBuilder()
-                builder.allocRunPos(
-                    textStyle.skFont, glyphsInfo.gids, glyphsInfo.positions
-                )
-                blob = builder.make()
+            fontChain = textStyle.fontChain
+            if not any("COLR" in style.ttFont for style in fontChain):
+                blob = textStyle.makeTextBlob(txt, align)
                 self._drawItem(self._canvas.drawTextBlob, blob, 0, 0)
             else:
-                from blackrenderer.backends.skia import SkiaCanvas
-
-                ttFont = textStyle.ttFont
-                brFont = textStyle.brFont
-                if textStyle.variations:
-                    brFont.setLocation(textStyle.variations)
-
-                canvas = SkiaCanvas(self._canvas)
-                scaleFactor = textStyle.fontSize / brFont.unitsPerEm
+                from .shaping import alignGlyphPositions
+
+                glyphsInfo = textStyle.shape(txt)
+                alignGlyphPositions(glyphsInfo, align)
+                outlineRuns = []
+                colorRuns = []
+                for fontRun in glyphsInfo.iterFontRuns():
+                    if "COLR" in fontChain[fontRun[0]].ttFont:
+                        colorRuns.append(fontRun)
+                    else:
+                        outlineRuns.append(fontRun)
+                if outlineRuns:
+                    blob = textStyle.makeGlyphsTextBlob(glyphsInfo, outlineRuns)
+                    self._drawItem(self._canvas.drawTextBlob, blob, 0, 0)
                 a, r, g, b = (ch / 255 for ch in self._gstate.fillPaint.color)
                 textColor = (r, g, b, a)
-                for gid, (x, y) in zip(glyphsInfo.gids, glyphsInfo.positions):
-                    glyphName = ttFont.getGlyphName(gid)
-                    with self._savedCanvasState():
-                        self._canvas.translate(x, y)
-                        self._canvas.scale(scaleFactor, -scaleFactor)
-                        brFont.drawGlyph(
-                            glyphName, canvas, palette=None, textColor=textColor
-                        )
+                gids = glyphsInfo.gids.tolist()
+                positions = glyphsInfo.positions.tolist()
+                for fontIndex, start, end in colorRuns:
+                    style = fontChain[fontIndex]
+                    ttFont = style.ttFont
+                    scaleFactor = style.fontSize / ttFont["head"].unitsPerEm
+                    for i in range(start, end):
+                        glyphName = ttFont.getGlyphName(gids[i])
+                        picture = style.getColorGlyphPicture(glyphName, textColor)
+                        x, y = positions[i]
+                        matrix = skia.Matrix.Translate(x, y)
+                        matrix.preScale(scaleFactor, -scaleFactor)
+                        self._canvas.drawPicture(picture, matrix)
 
     def image(self, imagePath, position, alpha=1.0):
         im = self._getImage(imagePath)
@@ -234,6 +234,16 @@ class Drawing:
             self._document.endPage()
         self._document.saveImage(fileName, **kwargs)
 
+    def saveImages(self, targets, **kwargs):
+        if self._document.isDrawing:
+            self._document.endPage()
+        self._document.saveImages(targets, **kwargs)
+
+    def pageImages(self, **kwargs):
+        if self._document.isDrawing:
+            self._document.endPage()
+        return self._document.pageImages(**kwargs)
+
     # Helpers
 
     def _drawItem(self, canvasMethod, *items):
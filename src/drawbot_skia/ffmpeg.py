@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 import os
 import subprocess
 import sys
@@ -10,11 +11,7 @@ FFMPEG_PATH = None
 def generateMP4(
     imageTemplate, mp4path, frameRate, codec="libx264", preferPyFFmpeg=False
 ):
-    ffmpegPath = FFMPEG_PATH
-    if ffmpegPath is None and not preferPyFFmpeg:
-        ffmpegPath = findExecutable("ffmpeg")
-    if ffmpegPath is None:
-        ffmpegPath = getPyFFmpegPath()
+    ffmpegPath = getFFmpegPath(preferPyFFmpeg)
     imageTemplate = os.fspath(imageTemplate)
     mp4path = os.fspath(mp4path)
     cmds = [
@@ -37,6 +34,72 @@ def generateMP4(
     runExternalProcess(cmds)
 
 
+@contextmanager
+def openMP4Writer(
+    mp4path, width, height, frameRate, codec="libx264", preferPyFFmpeg=False
+):
+    """Start ffmpeg to encode an mp4 file from raw RGBA frames, and yield a
+    function that writes a single frame, as a bytes object of
+    width * height * 4 bytes. The frames are piped to ffmpeg's stdin, so
+    encoding happens while the next frames are being rendered.
+    """
+    ffmpegPath = getFFmpegPath(preferPyFFmpeg)
+    mp4path = os.fspath(mp4path)
+    cmds = [
+        ffmpegPath,  # path to the ffmpeg executable
+        "-y",  # overwrite existing files
+        "-loglevel",
+        "16",  # 'error, 16' Show all errors, including ones which can be recovered from.
+        "-f",
+        "rawvideo",  # input format
+        "-pix_fmt",
+        "rgba",  # input pixel format
+        "-s",
+        f"{width}x{height}",  # input frame size
+        "-r",
+        str(frameRate),  # frame rate
+        "-i",
+        "-",  # read frames from stdin
+        "-c:v",
+        codec,  # codec
+        "-crf",
+        "20",  # Constant Rate Factor
+        "-pix_fmt",
+        "yuv420p10le",  # pixel format. 8bit: yuv420p 10bit: yuv420p10le, yuv422p10le, yuv444p10le
+        mp4path,  # output path
+    ]
+    # ffmpeg only writes errors to stderr, so it is safe to read it after
+    # all frames have been written
+    p = subprocess.Popen(
+        cmds,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    with p:
+        try:
+            yield p.stdin.write
+        except BrokenPipeError:
+            # ffmpeg exited early, its error is reported below
+            pass
+        except BaseException:
+            p.kill()
+            raise
+        stderrdata = p.communicate()[1]
+    if p.returncode != 0:
+        sys.stderr.write(stderrdata.decode("utf-8", "replace"))
+        raise subprocess.CalledProcessError(p.returncode, cmds)
+
+
+def getFFmpegPath(preferPyFFmpeg=False):
+    ffmpegPath = FFMPEG_PATH
+    if ffmpegPath is None and not preferPyFFmpeg:
+        ffmpegPath = findExecutable("ffmpeg")
+    if ffmpegPath is None:
+        ffmpegPath = getPyFFmpegPath()
+    return ffmpegPath
+
+
 def getPyFFmpegPath():
     try:
         import pyffmpeg
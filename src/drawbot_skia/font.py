@@ -1,4 +1,6 @@
+import mmap
 import struct
+import numpy as np
 import uharfbuzz as hb
 from fontTools.ttLib import TTFont
 
@@ -21,6 +23,34 @@ def makeHBFaceFromSkiaTypeface(skTypeface):
     return hb.Face.create_for_tables(getTable, None)
 
 
+# The first four bytes of font files that can be read without unpacking
+# them: TrueType, CFF, Apple TrueType and TrueType Collection files
+SFNT_MAGIC = {b"\0\1\0\0", b"OTTO", b"true", b"ttcf"}
+
+
+def isSFNTFile(fontPath):
+    """Return True if fontPath is a plain sfnt or collection file, which
+    HarfBuzz and fontTools can read directly, and not for example a WOFF or
+    WOFF2 file, whose tables need to be unpacked first.
+    """
+    with open(fontPath, "rb") as f:
+        return f.read(4) in SFNT_MAGIC
+
+
+def makeHBFaceFromPath(fontPath, fontNumber=0):
+    # HarfBuzz memory-maps the file, so the table data isn't copied
+    blob = hb.Blob.from_file_path(fontPath)
+    return hb.Face(blob, fontNumber)
+
+
+def makeTTFontFromPath(fontPath, fontNumber=0):
+    # Read from a memory-mapped file, so only the tables that fontTools
+    # actually decompiles are read
+    with open(fontPath, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return TTFont(data, lazy=True, fontNumber=fontNumber)
+
+
 def makeTTFontFromSkiaTypeface(skTypeface):
     ttf = TTFont(lazy=True)
     ttf.reader = SkiaSFNTReader(skTypeface)
@@ -50,6 +80,16 @@ class SkiaSFNTReader:
         return self.skTypeface.getTableData(self.tags[tag])
 
 
+def makeCoverageBitset(codePoints):
+    """Return a bitset covering all of Unicode as a numpy uint8 array, with
+    the bits for codePoints set. Bit n is (bitset[n >> 3] >> (n & 7)) & 1.
+    """
+    codePoints = np.fromiter(codePoints, dtype=np.intp)
+    covered = np.zeros(0x110000, dtype=bool)
+    covered[codePoints[codePoints < 0x110000]] = True
+    return np.packbits(covered, bitorder="little")
+
+
 def intToTag(intTag):
     return struct.pack(">i", intTag).decode()
 
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+from fontTools.ttLib import TTCollection, TTFont
+
+
+logger = logging.getLogger(__name__)
+
+
+FONT_FILE_EXTENSIONS = {".ttf", ".otf", ".ttc", ".otc"}
+
+# Bump this when the face info format changes, to invalidate stored indexes
+INDEX_FORMAT_VERSION = 1
+
+
+class FontIndex:
+
+    """An index of the fonts found in fontFolders, to look up font files by
+    PostScript name, full name or family name. If indexPath is given, the
+    index is stored there, and update() only reads the font files that have
+    been added or modified since the index was stored.
+    """
+
+    def __init__(self, fontFolders, indexPath=None):
+        self.fontFolders = [os.path.abspath(folder) for folder in fontFolders]
+        self.indexPath = None if indexPath is None else os.fspath(indexPath)
+        self.files = {}  # font path -> {"mtime": mtime, "faces": [faceInfo, ...]}
+        self._names = None
+        if self.indexPath is not None:
+            self._load()
+
+    def update(self):
+        """Scan the font folders, and read the font files that are new or
+        have changed. Store the index if anything changed.
+        """
+        files = {}
+        for fontPath in self._iterFontFiles():
+            mtime = os.stat(fontPath).st_mtime_ns
+            fileInfo = self.files.get(fontPath)
+            if fileInfo is None or fileInfo["mtime"] != mtime:
+                fileInfo = {"mtime": mtime, "faces": readFaceInfo(fontPath)}
+            files[fontPath] = fileInfo
+        if files != self.files:
+            self.files = files
+            self._names = None
+            if self.indexPath is not None:
+                self._save()
+
+    def lookUp(self, fontName):
+        """Return a (fontPath, fontNumber) tuple for fontName, or None if
+        the name is not found.
+        """
+        if self._names is None:
+            self._names = self._buildNames()
+        return self._names.get(fontName)
+
+    def faces(self):
+        """Iterate over the info dicts of all faces in the index."""
+        for fileInfo in self.files.values():
+            yield from fileInfo["faces"]
+
+    def _buildNames(self):
+        # PostScript names take precedence over full names, which take
+        # precedence over family names. A family name maps to its regular
+        # style if there is one, else to its first face.
+        faces = sorted(
+            self.faces(), key=lambda face: face["styleName"] not in REGULAR_STYLES
+        )
+        names = {}
+        for nameKey in ["postscriptName", "fullName", "familyName"]:
+            for face in faces:
+                name = face[nameKey]
+                if name and name not in names:
+                    names[name] = (face["path"], face["fontNumber"])
+        return names
+
+    def _iterFontFiles(self):
+        for fontFolder in self.fontFolders:
+            for folder, dirNames, fileNames in os.walk(fontFolder):
+                dirNames.sort()
+                for fileName in sorted(fileNames):
+                    if os.path.splitext(fileName)[1].lower() in FONT_FILE_EXTENSIONS:
+                        yield os.path.join(folder, fileName)
+
+    def _load(self):
+        try:
+            with open(self.indexPath, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            return
+        self.files = data["files"]
+
+    def _save(self):
+        data = {"version": INDEX_FORMAT_VERSION, "files": self.files}
+        tempPath = self.indexPath + ".tmp"
+        with open(tempPath, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        # Replace the index atomically, as other processes may be reading it
+        os.replace(tempPath, self.indexPath)
+
+
+REGULAR_STYLES = {"Regular", "Normal", "Roman", "Book"}
+
+
+def readFaceInfo(fontPath):
+    """Return a list with an info dict for each face in the font file,
+    or an empty list if the file can't be read.
+    """
+    try:
+        with open(fontPath, "rb") as f:
+            isCollection = f.read(4) == b"ttcf"
+        if isCollection:
+            with TTCollection(fontPath, lazy=True) as collection:
+                numFonts = len(collection.fonts)
+        else:
+            numFonts = 1
+        return [
+            _readSingleFaceInfo(fontPath, fontNumber) for fontNumber in range(numFonts)
+        ]
+    except Exception as e:
+        logger.warning("can't read font %s: %s", fontPath, e)
+        return []
+
+
+def _readSingleFaceInfo(fontPath, fontNumber):
+    with TTFont(fontPath, fontNumber=fontNumber, lazy=True) as ttFont:
+        nameTable = ttFont["name"]
+        axes = {}
+        if "fvar" in ttFont:
+            for axis in ttFont["fvar"].axes:
+                axes[axis.axisTag] = [axis.minValue, axis.defaultValue, axis.maxValue]
+        cmap = ttFont.getBestCmap() or {}
+        return {
+            "path": fontPath,
+            "fontNumber": fontNumber,
+            "familyName": nameTable.getBestFamilyName(),
+            "styleName": nameTable.getBestSubFamilyName(),
+            "fullName": nameTable.getBestFullName(),
+            "postscriptName": nameTable.getDebugName(6),
+            "axes": axes,
+            "coverage": codePointRanges(cmap),
+        }
+
+
+def codePointRanges(codePoints):
+    """Return a list of [first, last] ranges covering the code points."""
+    ranges = []
+    for codePoint in sorted(codePoints):
+        if ranges and ranges[-1][1] == codePoint - 1:
+            ranges[-1][1] = codePoint
+        else:
+            ranges.append([codePoint, codePoint])
+    return ranges
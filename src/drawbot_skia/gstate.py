@@ -1,11 +1,31 @@
+import importlib
 import logging
 import os
 import skia
-import uharfbuzz as hb
+from .cache import LRUCache
 from .errors import DrawbotError
-from .font import makeHBFaceFromSkiaTypeface, makeTTFontFromSkiaTypeface, tagToInt
-from .segmenting import textSegments, reorderedSegments
-from .shaping import shape
+
+# Text shaping and font handling use modules that are slow to import, such
+# as numpy, uharfbuzz and fontTools. They are imported on first use, so that
+# scripts that don't draw text start faster.
+
+_lazyNames = {
+    "makeHBFaceFromSkiaTypeface": "font",
+    "makeTTFontFromSkiaTypeface": "font",
+    "tagToInt": "font",
+    "textSegments": "segmenting",
+    "reorderedSegments": "segmenting",
+    "shape": "shaping",
+}
+
+
+def __getattr__(name):
+    # Names that used to be imported into this module
+    moduleName = _lazyNames.get(name)
+    if moduleName is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module("." + moduleName, __package__)
+    return getattr(module, name)
 
 
 class cached_property(object):
@@ -155,6 +175,13 @@ class GraphicsStateMixin:
     def fontSize(self, size):
         self.textStyle = self.textStyle.copy(fontSize=size)
 
+    def fallbackFont(self, *fontNamesOrPaths):
+        # Characters that the current font doesn't support are drawn with
+        # the first fallback font that does. Call without arguments or with
+        # None to remove the fallback fonts.
+        fallbackFonts = tuple(f for f in fontNamesOrPaths if f is not None)
+        self.textStyle = self.textStyle.copy(fallbackFonts=fallbackFonts)
+
     def lineHeight(self, value):
         self.textStyle = self.textStyle.copy(lineHeight=value)
 
@@ -399,6 +426,7 @@ class TextStyle(_ImmutableContainer):
     variations = {}  # won't get mutated
     language = None
     font = None
+    fallbackFonts = ()
     lineHeight = None
 
     def __init__(self, **properties):
@@ -413,9 +441,23 @@ class TextStyle(_ImmutableContainer):
         typeface = self.fontObjects.skTypeface
         ttFont = self.fontObjects.ttFont
         if self.variations and "fvar" in ttFont:
-            typeface = _cloneTypeface(typeface, ttFont, self.variations)
+            location = _normalizeLocation(ttFont["fvar"], self.variations)
+            key = (self.font, location)
+            clonedTypeface = _typefaceCloneCache.get(key)
+            if clonedTypeface is None:
+                clonedTypeface = _cloneTypeface(typeface, location)
+                _typefaceCloneCache[key] = clonedTypeface
+            typeface = clonedTypeface
         return _makeFontFromTypeface(typeface, self.fontSize)
 
+    @cached_property
+    def fontChain(self):
+        # This style, followed by a style for each fallback font
+        fallbackStyles = [
+            self.copy(font=font, fallbackFonts=()) for font in self.fallbackFonts
+        ]
+        return [self] + fallbackStyles
+
     @property
     def ttFont(self):
         return self.fontObjects.ttFont
@@ -428,33 +470,80 @@ class TextStyle(_ImmutableContainer):
     def brFont(self):
         return self.fontObjects.brFont
 
+    @cached_property
+    def _shapingKey(self):
+        # All properties that affect shaping, in hashable form
+        return (
+            self.font,
+            self.skFont.getSize(),
+            tuple(sorted(self.features.items())),
+            tuple(sorted(self.variations.items())),
+            self.language,
+            tuple(self.fallbackFonts),
+        )
+
     def shape(self, txt):
-        segments, baseLevel = textSegments(txt)
-        segments = reorderedSegments(segments, baseLevel % 2, lambda item: item[2] % 2)
-        startPos = (0, 0)
-        glyphsInfo = None
-        for runChars, script, bidiLevel, index in segments:
-            runInfo = shape(
-                self.hbFont,
-                runChars,
-                fontSize=self.skFont.getSize(),
-                startPos=startPos,
-                startCluster=index,
-                flippedCanvas=True,
-                features=self.features,
-                variations=self.variations,
-                language=self.language,
-            )
-            if glyphsInfo is None:
-                glyphsInfo = runInfo
-            else:
-                glyphsInfo.gids += runInfo.gids
-                glyphsInfo.clusters += runInfo.clusters
-                glyphsInfo.positions += runInfo.positions
-                glyphsInfo.endPos = runInfo.endPos
-            startPos = runInfo.endPos
-        glyphsInfo.baseLevel = baseLevel
-        return glyphsInfo
+        key = (txt, *self._shapingKey)
+        glyphsInfo = _shapingCache.get(key)
+        if glyphsInfo is None:
+            glyphsInfo = _shapeText(*key)
+            _shapingCache[key] = glyphsInfo
+        # The cached object is shared, so hand out a copy that callers
+        # can assign new arrays to
+        return glyphsInfo.copy()
+
+    def getGlyphPaths(self, gids):
+        """Return a list of skia.Path glyph outlines for gids, at a font size
+        of 1 and flipped vertically, so y points down.
+        """
+        variationsKey = self._shapingKey[3]
+        paths = []
+        unitFont = None
+        for gid in gids:
+            key = (self.font, variationsKey, gid)
+            path = _glyphPathCache.get(key)
+            if path is None:
+                if unitFont is None:
+                    unitFont = _makeFontFromTypeface(self.skFont.getTypeface(), 1)
+                path = unitFont.getPath(gid)
+                path.transform(_unitFlipMatrix)
+                _glyphPathCache[key] = path
+            paths.append(path)
+        return paths
+
+    def getColorGlyphPicture(self, glyphName, textColor, palette=None):
+        """Return a skia.Picture of a COLR glyph, drawn in font units with
+        y pointing up. textColor is an (r, g, b, a) tuple with values
+        between 0 and 1.
+        """
+        paletteKey = None if palette is None else tuple(palette)
+        key = (self.font, self._shapingKey[3], glyphName, textColor, paletteKey)
+        picture = _colorGlyphPictureCache.get(key)
+        if picture is None:
+            brFont = self.brFont
+            # The BlackRendererFont is shared by all styles using this font,
+            # so always set the location, also when it is the default
+            brFont.setLocation(self.variations)
+            picture = _recordColorGlyph(brFont, glyphName, textColor, palette)
+            _colorGlyphPictureCache[key] = picture
+        return picture
+
+    def makeGlyphsTextBlob(self, glyphsInfo, fontRuns=None):
+        # Make a text blob for shaped glyphs, optionally only for some of
+        # the (fontIndex, start, end) runs from glyphsInfo.iterFontRuns()
+        return _makeTextBlob(self.fontChain, glyphsInfo, fontRuns)
+
+    def makeTextBlob(self, txt, align=None):
+        key = (txt, align) + self._shapingKey
+        blob = _textBlobCache.get(key)
+        if blob is None:
+            from .shaping import alignGlyphPositions
+
+            glyphsInfo = self.shape(txt)
+            alignGlyphPositions(glyphsInfo, align)
+            blob = self.makeGlyphsTextBlob(glyphsInfo)
+            _textBlobCache[key] = blob
+        return blob
 
     def getLineHeight(self):
         if self.lineHeight is not None:
@@ -463,11 +552,156 @@ class TextStyle(_ImmutableContainer):
             return self.fontSize * 1.2
 
 
-_fontObjectsCache = {}
+def _shapeText(txt, font, fontSize, features, variations, language, fallbackFonts):
+    import numpy as np
+    from .segmenting import fallbackFontIndices, reorderedSegments, textSegments
+    from .shaping import GlyphRun, shape
+
+    fonts = [font, *fallbackFonts]
+    features = dict(features)
+    variations = dict(variations)
+    fontIndices = None
+    if fallbackFonts:
+        coverages = [_getFontObjects(font).coverage for font in fonts]
+        fontIndices = fallbackFontIndices(txt, coverages)
+    segments, baseLevel = textSegments(txt)
+    segments = reorderedSegments(segments, baseLevel % 2, lambda item: item[2] % 2)
+    startPos = (0, 0)
+    glyphRuns = []
+    for runChars, script, bidiLevel, index in segments:
+        if fontIndices is None:
+            fontRuns = [(runChars, index, 0)]
+        else:
+            fontRuns = _splitFontRuns(runChars, index, fontIndices, bidiLevel % 2)
+        for fontRunChars, fontRunIndex, fontIndex in fontRuns:
+            runInfo = shape(
+                _getFontObjects(fonts[fontIndex]).hbFont,
+                fontRunChars,
+                fontSize=fontSize,
+                startPos=startPos,
+                startCluster=fontRunIndex,
+                flippedCanvas=True,
+                features=features,
+                variations=variations,
+                language=language,
+            )
+            if fontIndices is not None:
+                runInfo.fontIndices = np.full(len(runInfo), fontIndex, dtype=np.uint8)
+            glyphRuns.append(runInfo)
+            startPos = runInfo.endPos
+    glyphsInfo = GlyphRun.concatenate(glyphRuns)
+    glyphsInfo.baseLevel = baseLevel
+    for array in [glyphsInfo.gids, glyphsInfo.clusters, glyphsInfo.positions]:
+        array.flags.writeable = False  # guard the cached result
+    return glyphsInfo
+
+
+def _splitFontRuns(runChars, index, fontIndices, isRTL):
+    # Split a segment into (chars, index, fontIndex) runs of characters that
+    # use the same font, in visual order
+    import numpy as np
+
+    numChars = len(runChars)
+    runFontIndices = fontIndices[index:][:numChars]
+    boundaries = (np.flatnonzero(np.diff(runFontIndices)) + 1).tolist()
+    starts = [0] + boundaries
+    ends = boundaries + [numChars]
+    fontRuns = [
+        (runChars[start:end], index + start, int(runFontIndices[start]))
+        for start, end in zip(starts, ends)
+    ]
+    if isRTL:
+        fontRuns.reverse()
+    return fontRuns
+
+
+DEFAULT_SHAPING_CACHE_SIZE = 2048
+
+# Shaping results, keyed by the text and all text style properties that
+# affect shaping. textSize() followed by text() only needs to shape once.
+_shapingCache = LRUCache(DEFAULT_SHAPING_CACHE_SIZE)
+
+
+def _makeTextBlob(fontChain, glyphsInfo, fontRuns=None):
+    if fontRuns is None:
+        fontRuns = glyphsInfo.iterFontRuns()
+    builder = skia.TextBlobBuilder()
+    for fontIndex, start, end in fontRuns:
+        skFont = fontChain[fontIndex].skFont
+        gids = glyphsInfo.gids[start:end]
+        xPositions = glyphsInfo.positions[start:end, 0]
+        yPositions = glyphsInfo.positions[start:end, 1]
+        if (yPositions == yPositions[0]).all():
+            # Horizontal positioning takes the arrays as they are, saving us
+            # the creation of a skia.Point for each glyph
+            builder.allocRunPosH(skFont, gids, xPositions, yPositions[0])
+        else:
+            positions = glyphsInfo.positions[start:end].tolist()
+            points = [skia.Point(x, y) for x, y in positions]
+            builder.allocRunPos(skFont, gids, points)
+    return builder.make()
+
+
+DEFAULT_TEXTBLOB_CACHE_SIZE = 512
+
+# Finished text blobs, for text that is drawn repeatedly with the same
+# style, such as headers, footers and labels.
+_textBlobCache = LRUCache(DEFAULT_TEXTBLOB_CACHE_SIZE)
+
+
+DEFAULT_GLYPHPATH_CACHE_SIZE = 10000
+
+# Unit-size glyph outlines, keyed by (font, variations, gid)
+_glyphPathCache = LRUCache(DEFAULT_GLYPHPATH_CACHE_SIZE)
+
+_unitFlipMatrix = skia.Matrix.Scale(1, -1)
+
+
+def _recordColorGlyph(brFont, glyphName, textColor, palette):
+    from blackrenderer.backends.skia import SkiaCanvas
+
+    bounds = brFont.getGlyphBounds(glyphName)
+    cullRect = skia.Rect.MakeEmpty() if bounds is None else skia.Rect(*bounds)
+    recorder = skia.PictureRecorder()
+    canvas = SkiaCanvas(recorder.beginRecording(cullRect))
+    brFont.drawGlyph(glyphName, canvas, palette=palette, textColor=textColor)
+    return recorder.finishRecordingAsPicture()
+
+
+DEFAULT_COLORGLYPH_CACHE_SIZE = 1000
+
+# Recorded COLR glyphs, keyed by (font, variations, glyphName, textColor, palette)
+_colorGlyphPictureCache = LRUCache(DEFAULT_COLORGLYPH_CACHE_SIZE)
+
+
+DEFAULT_FONT_CACHE_SIZE = 256
+DEFAULT_FONT_CACHE_BYTES = None
+
+# FontObjects, keyed by font name or path
+_fontObjectsCache = LRUCache(
+    DEFAULT_FONT_CACHE_SIZE,
+    DEFAULT_FONT_CACHE_BYTES,
+    sizeFunc=lambda fontObjects: fontObjects.estimateSize(),
+)
 
 
 def clearFontCache():
-    _fontObjectsCache.clear()
+    for cache in _caches.values():
+        cache.clear()
+
+
+_fontIndex = None
+
+
+def setFontIndex(fontIndex):
+    """Set a fontindex.FontIndex object to look up font names that aren't
+    file paths. Names that aren't found in the index are looked up by the
+    system font manager. Pass None to use the system font manager only.
+    This clears the font cache.
+    """
+    global _fontIndex
+    _fontIndex = fontIndex
+    clearFontCache()
 
 
 def _getFontObjects(fontNameOrPath):
@@ -482,43 +716,101 @@ class FontObjects:
     def __init__(self, fontNameOrPath):
         self.fontNameOrPath = fontNameOrPath
 
+    @cached_property
+    def fontFile(self):
+        # A (fontPath, fontNumber) tuple, or None if the font isn't loaded
+        # from a file
+        if self.fontNameOrPath is None:
+            return None
+        fontPath = os.fspath(self.fontNameOrPath)
+        if os.path.exists(fontPath):
+            return fontPath, 0
+        if _fontIndex is not None:
+            return _fontIndex.lookUp(fontPath)
+        return None
+
+    @cached_property
+    def sfntFile(self):
+        # fontFile, if HarfBuzz and fontTools can read it directly. Other
+        # files, such as WOFF and WOFF2, get their tables through Skia.
+        from .font import isSFNTFile
+
+        if self.fontFile is not None and isSFNTFile(self.fontFile[0]):
+            return self.fontFile
+        return None
+
     @cached_property
     def skTypeface(self):
         fontNameOrPath = self.fontNameOrPath
         if fontNameOrPath is None:
             typeface = skia.Typeface(None)
+        elif self.fontFile is None:
+            typeface = skia.Typeface(os.fspath(fontNameOrPath))
         else:
-            fontNameOrPath = os.fspath(fontNameOrPath)
-            if not os.path.exists(fontNameOrPath):
-                typeface = skia.Typeface(fontNameOrPath)
-            else:
-                typeface = skia.Typeface.MakeFromFile(fontNameOrPath)
-                if typeface is None:
-                    raise DrawbotError(f"can't load font: {fontNameOrPath}")
+            # Skia memory-maps the file
+            typeface = skia.Typeface.MakeFromFile(*self.fontFile)
+            if typeface is None:
+                raise DrawbotError(f"can't load font: {self.fontFile[0]}")
         return typeface
 
     @cached_property
     def ttFont(self):
+        from .font import makeTTFontFromPath, makeTTFontFromSkiaTypeface
+
+        if self.sfntFile is not None:
+            self.skTypeface  # raises DrawbotError if Skia can't load the font
+            return makeTTFontFromPath(*self.sfntFile)
         return makeTTFontFromSkiaTypeface(self.skTypeface)
 
+    @cached_property
+    def coverage(self):
+        from .font import makeCoverageBitset
+
+        return makeCoverageBitset(self.ttFont.getBestCmap() or {})
+
+    def estimateSize(self):
+        # The total size of the font's tables. For fonts loaded from a file
+        # this data is memory-mapped and shared, so this is an upper bound.
+        typeface = self.skTypeface
+        return sum(typeface.getTableSize(tag) for tag in typeface.getTableTags())
+
     @cached_property
     def hbFont(self):
-        return hb.Font(makeHBFaceFromSkiaTypeface(self.skTypeface))
+        from .font import makeHBFaceFromPath, makeHBFaceFromSkiaTypeface
+        from .shaping import ShapingFont
+
+        if self.sfntFile is not None:
+            self.skTypeface  # raises DrawbotError if Skia can't load the font
+            return ShapingFont(makeHBFaceFromPath(*self.sfntFile))
+        return ShapingFont(makeHBFaceFromSkiaTypeface(self.skTypeface))
 
     @cached_property
     def brFont(self):
+        import uharfbuzz as hb
         from blackrenderer.font import BlackRendererFont
 
-        return BlackRendererFont(ttFont=self.ttFont, hbFont=self.hbFont)
+        # BlackRendererFont changes the variations of its hb.Font, so it
+        # can't share our ShapingFont
+        hbFont = hb.Font(self.hbFont.face)
+        return BlackRendererFont(ttFont=self.ttFont, hbFont=hbFont)
 
 
-def _cloneTypeface(typeface, ttFont, variations):
-    fvar = ttFont.get("fvar")
-    defaultLocation = {
-        a.axisTag: variations.get(a.axisTag, a.defaultValue) for a in fvar.axes
-    }
-    tags = [a.axisTag for a in fvar.axes]
-    location = [(tag, variations.get(tag, defaultLocation[tag])) for tag in tags]
+def _normalizeLocation(fvar, variations):
+    # Return a complete location as a tuple of (tag, value) pairs, with
+    # values clamped to the axis ranges and optionally quantized
+    location = []
+    for axis in fvar.axes:
+        value = variations.get(axis.axisTag, axis.defaultValue)
+        if _variationQuantization:
+            value = round(value / _variationQuantization) * _variationQuantization
+        value = min(max(value, axis.minValue), axis.maxValue)
+        location.append((axis.axisTag, value))
+    return tuple(location)
+
+
+def _cloneTypeface(typeface, location):
+    from .font import tagToInt
+
     makeCoord = skia.FontArguments.VariationPosition.Coordinate
     rawCoords = [makeCoord(tagToInt(tag), value) for tag, value in location]
     coords = skia.FontArguments.VariationPosition.Coordinates(rawCoords)
@@ -528,6 +820,73 @@ def _cloneTypeface(typeface, ttFont, variations):
     return typeface.makeClone(fontArgs)
 
 
+DEFAULT_TYPEFACE_CACHE_SIZE = 256
+
+# Variable font instances, keyed by (font, location)
+_typefaceCloneCache = LRUCache(DEFAULT_TYPEFACE_CACHE_SIZE)
+
+_variationQuantization = None
+
+
+# The text and font caches, by the names used by setCacheSize() and
+# getCacheInfo()
+_caches = {
+    "shaping": _shapingCache,
+    "textBlob": _textBlobCache,
+    "glyphPath": _glyphPathCache,
+    "colorGlyph": _colorGlyphPictureCache,
+    "font": _fontObjectsCache,
+    "typeface": _typefaceCloneCache,
+}
+
+
+def setCacheSize(name, maxSize, maxBytes=None):
+    """Set the maximum number of items to keep in one of the text and font
+    caches. This clears the cache. Pass 0 to disable the cache, None for an
+    unbounded cache. The caches are
+    "shaping" (shaping results), "textBlob" (text blobs for drawing),
+    "glyphPath" (glyph outlines), "colorGlyph" (recorded COLR glyphs),
+    "font" (loaded fonts) and "typeface" (variable font instances). For the
+    "font" cache, maxBytes optionally limits the estimated number of bytes
+    the fonts may use.
+    """
+    cache = _getCache(name)
+    if maxBytes is not None and cache.sizeFunc is None:
+        raise ValueError(f"the {name!r} cache doesn't support maxBytes")
+    cache.clear()
+    cache.resize(maxSize, maxBytes)
+
+
+def getCacheInfo(name):
+    """Return a cache.CacheInfo named tuple for one of the text and font
+    caches, with hits, misses, maxsize and currsize fields, like
+    functools.lru_cache's cache_info(), as well as evictions, maxbytes and
+    currbytes fields. See setCacheSize() for the cache names.
+    """
+    return _getCache(name).cacheInfo()
+
+
+def _getCache(name):
+    cache = _caches.get(name)
+    if cache is None:
+        raise ValueError(f"unknown cache: {name!r}")
+    return cache
+
+
+def setVariationQuantization(step):
+    """Round axis values to a multiple of step when making variable font
+    instances for drawing, so nearby locations share a cached instance.
+    This only affects outlines, not shaping. Pass None to disable
+    quantization, which is the default.
+    """
+    global _variationQuantization
+    _variationQuantization = step
+    # Cached outlines and text blobs may refer to the old instances
+    _typefaceCloneCache.clear()
+    _glyphPathCache.clear()
+    _textBlobCache.clear()
+
+
 def _makeFontFromTypeface(typeface, size):
     font = skia.Font(typeface, size)
     font.setForceAutoHinting(False)
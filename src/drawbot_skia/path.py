@@ -5,7 +5,6 @@ from fontTools.misc.transform import Transform
 from fontTools.pens.basePen import BasePen
 from fontTools.pens.pointPen import PointToSegmentPen, SegmentToPointPen
 from .gstate import TextStyle
-from .shaping import alignGlyphPositions
 
 
 # TODO:
@@ -203,18 +202,20 @@ class BezierPath(BasePen):
     def text(self, txt, offset=None, font=None, fontSize=10, align=None):
         if not txt:
             return
+        import numpy as np
+        from .shaping import alignGlyphPositions
+
         textStyle = TextStyle(font=font, fontSize=fontSize)
         glyphsInfo = textStyle.shape(txt)
         alignGlyphPositions(glyphsInfo, align)
-        gids = sorted(set(glyphsInfo.gids))
-        paths = [textStyle.skFont.getPath(gid) for gid in gids]
-        for path in paths:
-            path.transform(FLIP_MATRIX)
-        paths = dict(zip(gids, paths))
+        gids = np.unique(glyphsInfo.gids).tolist()
+        paths = dict(zip(gids, textStyle.getGlyphPaths(gids)))
         x, y = (0, 0) if offset is None else offset
-        for gid, pos in zip(glyphsInfo.gids, glyphsInfo.positions):
-            path = paths[gid]
-            self.path.addPath(path, pos[0] + x, pos[1] + y)
+        matrix = skia.Matrix.Scale(fontSize, fontSize)
+        for gid, pos in zip(glyphsInfo.gids.tolist(), glyphsInfo.positions.tolist()):
+            matrix.setTranslateX(pos[0] + x)
+            matrix.setTranslateY(pos[1] + y)
+            self.path.addPath(paths[gid], matrix)
 
     def _doPathOp(self, other, operator):
         from pathops import Path, op
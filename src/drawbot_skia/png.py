@@ -0,0 +1,75 @@
+import struct
+import zlib
+import numpy as np
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+PNG_COLORTYPE_RGBA = 6
+
+PNG_FILTER_SUB = 1
+
+
+class PNGWriter:
+
+    """Write an 8-bit RGBA PNG file row by row, so that images that are too
+    large to hold in memory can be written in bands. Rows are passed to
+    writeRows() as unpremultiplied RGBA pixels.
+    """
+
+    def __init__(self, path, width, height, compressionLevel=6):
+        self.width = width
+        self.height = height
+        self.rowsWritten = 0
+        self._compressor = zlib.compressobj(compressionLevel)
+        self._file = open(path, "wb")
+        self._file.write(PNG_SIGNATURE)
+        header = struct.pack(">IIBBBBB", width, height, 8, PNG_COLORTYPE_RGBA, 0, 0, 0)
+        self._writeChunk(b"IHDR", header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def writeRows(self, pixels):
+        """Write rows of pixels. pixels is a bytes-like object or a uint8
+        array, holding a whole number of rows of width * 4 bytes.
+        """
+        rows = np.frombuffer(pixels, dtype=np.uint8).reshape((-1, self.width * 4))
+        if self.rowsWritten + len(rows) > self.height:
+            raise ValueError("too many rows written to PNG")
+        # Apply the Sub filter to each row: store the difference with the
+        # same channel of the pixel to the left, which compresses much
+        # better than the raw pixels for typical drawings
+        filtered = np.empty((len(rows), self.width * 4 + 1), dtype=np.uint8)
+        filtered[:, 0] = PNG_FILTER_SUB
+        filtered[:, 1:5] = rows[:, :4]
+        np.subtract(rows[:, 4:], rows[:, :-4], out=filtered[:, 5:])
+        self._writeData(self._compressor.compress(filtered))
+        self.rowsWritten += len(rows)
+
+    def close(self):
+        try:
+            if self.rowsWritten != self.height:
+                raise ValueError(
+                    f"PNG has {self.height} rows, but {self.rowsWritten} were written"
+                )
+            self._writeData(self._compressor.flush())
+            self._writeChunk(b"IEND", b"")
+        finally:
+            self._file.close()
+
+    def _writeData(self, data):
+        if data:
+            self._writeChunk(b"IDAT", data)
+
+    def _writeChunk(self, chunkType, data):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(chunkType)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunkType))))
@@ -1,18 +1,11 @@
+import functools
 import itertools
-from fontTools.unicodedata import script
-from unicodedata2 import category
-
-# Monkeypatch bidi to use unicodedata2
-import unicodedata2
-import bidi.algorithm
-
-bidi.algorithm.bidirectional = unicodedata2.bidirectional
-bidi.algorithm.category = unicodedata2.category
-bidi.algorithm.mirrored = unicodedata2.mirrored
-from bidi.algorithm import (  # noqa: ignore E402
+import numpy as np
+from fontTools.unicodedata import Scripts
+from unicodedata2 import bidirectional, category
+from bidi.algorithm import (
+    debug_storage,
     get_empty_storage,
-    get_base_level,
-    get_embedding_levels,
     explicit_embed_and_overrides,
     resolve_weak_types,
     resolve_neutral_types,
@@ -20,14 +13,136 @@ from bidi.algorithm import (  # noqa: ignore E402
     reorder_resolved_levels,
     PARAGRAPH_LEVELS,
 )
-from bidi.mirror import MIRRORED  # noqa: ignore E402
+from bidi.mirror import MIRRORED
 
 
 UNKNOWN_SCRIPT = {"Zinh", "Zyyy", "Zxxx"}
 
+# Bidi classes that can't cause anything but level 0 in a paragraph that
+# contains no strong RTL characters and no explicit embeddings, overrides
+# or isolates.
+LTR_BIDI_CLASSES = {"L", "EN", "ES", "ET", "CS", "NSM", "BN", "B", "S", "WS", "ON"}
+
+# All values unicodedata2.bidirectional() can return, the empty string is
+# for unassigned code points
+BIDI_CLASSES = [
+    "",
+    "L",
+    "R",
+    "AL",
+    "EN",
+    "ES",
+    "ET",
+    "AN",
+    "CS",
+    "NSM",
+    "BN",
+    "B",
+    "S",
+    "WS",
+    "ON",
+    "LRE",
+    "LRO",
+    "RLE",
+    "RLO",
+    "PDF",
+    "LRI",
+    "RLI",
+    "FSI",
+    "PDI",
+]
+
+SCRIPT_CODES = sorted(set(Scripts.VALUES) | UNKNOWN_SCRIPT)
+
+# Script and bidi class lookups use tables that map code points to indices
+# into SCRIPT_CODES and BIDI_CLASSES. The tables are built on first use.
+# Strings of at least VECTORIZE_MIN_LENGTH characters are resolved with
+# NumPy in one go, for shorter strings NumPy's per-call overhead outweighs
+# the gains, and we look up characters one by one.
+
+VECTORIZE_MIN_LENGTH = 256
+
+_unknownScriptIndices = {SCRIPT_CODES.index(code) for code in UNKNOWN_SCRIPT}
+_unknownScriptMask = np.array([code in UNKNOWN_SCRIPT for code in SCRIPT_CODES])
+_fallbackScriptIndex = SCRIPT_CODES.index("Zxxx")
+_inheritedScriptIndex = SCRIPT_CODES.index("Zinh")
+_noScriptIndex = -1
+_bidiClassIndices = {bidiClass: i for i, bidiClass in enumerate(BIDI_CLASSES)}
+_bidiClassNames = np.array(BIDI_CLASSES, dtype=object)
+
+
+@functools.lru_cache(maxsize=None)
+def _getScriptTable():
+    # Covers all of Unicode: Scripts.RANGES lists the first code point of
+    # each range, Scripts.VALUES the script code for each range
+    assert Scripts.RANGES[0] == 0
+    scriptIndices = {code: i for i, code in enumerate(SCRIPT_CODES)}
+    values = np.array([scriptIndices[v] for v in Scripts.VALUES], dtype=np.uint8)
+    lengths = np.diff(Scripts.RANGES + [0x110000])
+    return np.repeat(values, lengths)
+
+
+@functools.lru_cache(maxsize=None)
+def _getScriptTableBytes():
+    # Indexing bytes is cheaper than indexing an array for single items
+    return _getScriptTable().tobytes()
+
+
+@functools.lru_cache(maxsize=None)
+def _getBiDiClassTable():
+    # Covers the BMP only, other characters are looked up individually
+    return np.array(
+        [_bidiClassIndices[bidirectional(chr(i))] for i in range(0x10000)],
+        dtype=np.uint8,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _getClosingBrackets():
+    return frozenset(ch for ch in MIRRORED if category(ch) == "Pe")
+
+
+@functools.lru_cache(maxsize=None)
+def _getClosingBracketTable():
+    table = np.zeros(0x10000, dtype=bool)
+    for ch in _getClosingBrackets():
+        table[ord(ch)] = True  # they are all in the BMP
+    return table
+
+
+def _textToCodePoints(txt):
+    codePoints = np.frombuffer(txt.encode("utf-32-le", "surrogatepass"), np.uint32)
+    return codePoints.astype(np.intp)  # makes table lookups faster
+
 
 def textSegments(txt):
-    scripts = detectScript(txt)
+    segments = _simpleTextSegments(txt)
+    if segments is not None:
+        return segments, 0
+    return _fullTextSegments(txt)
+
+
+def _simpleTextSegments(txt):
+    # Fast path for the common case: text that is left-to-right only
+    # and uses a single script. This results in a single segment at
+    # bidi level 0, so we can skip the bidi algorithm. Returns None if
+    # the fast path does not apply.
+    chars = set(txt)
+    if not LTR_BIDI_CLASSES.issuperset(map(bidirectional, chars)):
+        return None
+    scriptTable = _getScriptTableBytes()
+    scriptIndices = set(map(scriptTable.__getitem__, map(ord, chars)))
+    scriptIndices -= _unknownScriptIndices
+    if len(scriptIndices) > 1:
+        return None
+    if not txt:
+        return []
+    runScript = SCRIPT_CODES[scriptIndices.pop()] if scriptIndices else "Zxxx"
+    return [(txt, runScript, 0, 0)]
+
+
+def _fullTextSegments(txt):
+    scripts = _detectScriptIndices(txt)
     storage = getBiDiInfo(txt)
 
     levels = [None] * len(txt)
@@ -53,8 +168,8 @@ def textSegments(txt):
         nextIndex = index + rl
         segment = charInfo[index:nextIndex]
         runChars = txt[index:nextIndex]
-        script, bidiLevel = segment[0]
-        segments.append((runChars, script, bidiLevel, index))
+        scriptIndex, bidiLevel = segment[0]
+        segments.append((runChars, SCRIPT_CODES[scriptIndex], bidiLevel, index))
         index = nextIndex
     return segments, storage["base_level"]
 
@@ -73,17 +188,25 @@ def reorderedSegments(segments, isRTL, isSegmentRTLFunc):
 
 
 def detectScript(txt):
-    charScript = [script(c) for c in txt]
+    return [SCRIPT_CODES[i] for i in _detectScriptIndices(txt)]
+
+
+def _detectScriptIndices(txt):
+    if len(txt) >= VECTORIZE_MIN_LENGTH:
+        return _detectScriptIndicesVectorized(_textToCodePoints(txt)).tolist()
+
+    scriptTable = _getScriptTableBytes()
+    closingBrackets = _getClosingBrackets()
+    charScript = list(map(scriptTable.__getitem__, map(ord, txt)))
 
     for i, ch in enumerate(txt):
         scr = charScript[i]
-        if scr in UNKNOWN_SCRIPT:
+        if scr in _unknownScriptIndices:
             if i:
                 scr = charScript[i - 1]
             else:
                 scr = None
-            cat = category(ch)
-            if ch in MIRRORED and cat == "Pe":
+            if ch in closingBrackets:
                 scr = None
         charScript[i] = scr
 
@@ -97,7 +220,7 @@ def detectScript(txt):
 
     # There may be unknowns at the end of the string, fall back to
     # preceding script
-    prev = "Zxxx"  # last resort
+    prev = _fallbackScriptIndex  # last resort
     for i in range(len(txt)):
         if charScript[i] is None:
             charScript[i] = prev
@@ -109,6 +232,78 @@ def detectScript(txt):
     return charScript
 
 
+def _detectScriptIndicesVectorized(codePoints):
+    # Does the same as the loops in _detectScriptIndices(), for all
+    # characters at once
+    scriptIndices = _getScriptTable()[codePoints].astype(np.intp)
+    isKnown = ~_unknownScriptMask[scriptIndices]
+    if isKnown.all():
+        return scriptIndices
+
+    # Unknowns take the script of the preceding character, except for
+    # closing brackets, which are treated like unknowns at the start of
+    # the string. (U+FFFF is a noncharacter, so clipping is fine.)
+    isClosingBracket = _getClosingBracketTable().take(codePoints, mode="clip")
+    isClosingBracket &= ~isKnown
+    scriptIndices = np.where(isKnown, scriptIndices, _noScriptIndex)
+    scriptIndices = _fillForward(
+        scriptIndices, isKnown | isClosingBracket, _noScriptIndex
+    )
+
+    # Any unknowns should be mapped to the _next_ script
+    hasScript = scriptIndices != _noScriptIndex
+    reversedIndices = _fillForward(scriptIndices[::-1], hasScript[::-1], _noScriptIndex)
+    scriptIndices = reversedIndices[::-1]
+
+    # There may be unknowns at the end of the string, fall back to
+    # preceding script
+    hasScript = scriptIndices != _noScriptIndex
+    return _fillForward(scriptIndices, hasScript, _fallbackScriptIndex)
+
+
+def fallbackFontIndices(txt, coverages):
+    """Return an array with for each character in txt the index of the
+    first coverage bitset (see font.makeCoverageBitset()) that includes it,
+    or 0 if none does. Characters of the Inherited script, such as combining
+    marks, variation selectors and joiners, get the index of the preceding
+    character, so they are shaped together.
+    """
+    codePoints = _textToCodePoints(txt)
+    byteIndices = codePoints >> 3
+    bitMasks = np.left_shift(1, codePoints & 7).astype(np.uint8)
+    fontIndices = np.zeros(len(codePoints), dtype=np.uint8)
+    uncovered = np.ones(len(codePoints), dtype=bool)
+    for fontIndex, coverage in enumerate(coverages):
+        covered = (coverage[byteIndices] & bitMasks).astype(bool)
+        fontIndices[uncovered & covered] = fontIndex
+        uncovered &= ~covered
+        if not uncovered.any():
+            break
+    isInherited = _getScriptTable()[codePoints] == _inheritedScriptIndex
+    if isInherited.any():
+        fontIndices = _fillForward(fontIndices, ~isInherited, 0).astype(np.uint8)
+    return fontIndices
+
+
+def _fillForward(values, isSet, default):
+    # Replace each value for which isSet is False with the nearest
+    # preceding value for which isSet is True, or with default. Index -1
+    # picks the default from the end of the extended values array.
+    positions = np.arange(len(values))
+    sourcePositions = np.maximum.accumulate(np.where(isSet, positions, -1))
+    return np.append(values, default)[sourcePositions]
+
+
+def _lookUpBiDiClasses(txt):
+    if len(txt) < VECTORIZE_MIN_LENGTH:
+        return list(map(bidirectional, txt))
+    codePoints = _textToCodePoints(txt)
+    bidiClasses = _getBiDiClassTable().take(codePoints, mode="clip")
+    for i in np.flatnonzero(codePoints >= 0x10000):
+        bidiClasses[i] = _bidiClassIndices[bidirectional(chr(codePoints[i]))]
+    return _bidiClassNames[bidiClasses].tolist()
+
+
 # copied from bidi/algorthm.py and modified to be more useful for us.
 
 
@@ -126,19 +321,31 @@ def getBiDiInfo(text, *, upper_is_rtl=False, base_dir=None, debug=False):
     """
     storage = get_empty_storage()
 
+    bidiTypes = _lookUpBiDiClasses(text)
+    if upper_is_rtl:
+        bidiTypes = ["R" if ch.isupper() else t for ch, t in zip(text, bidiTypes)]
+
     if base_dir is None:
-        base_level = get_base_level(text, upper_is_rtl)
+        # P2, P3
+        base_level = 0
+        for bidiType in bidiTypes:
+            if bidiType in ("AL", "R"):
+                base_level = 1
+                break
+            elif bidiType == "L":
+                break
     else:
         base_level = PARAGRAPH_LEVELS[base_dir]
 
     storage["base_level"] = base_level
     storage["base_dir"] = ("L", "R")[base_level]
 
-    get_embedding_levels(text, storage, upper_is_rtl, debug)
-    assert len(text) == len(storage["chars"])
-    for index, (ch, chInfo) in enumerate(zip(text, storage["chars"])):
-        assert ch == chInfo["ch"]
-        chInfo["index"] = index
+    storage["chars"] = [
+        dict(ch=ch, level=base_level, type=bidiType, orig=bidiType, index=index)
+        for index, (ch, bidiType) in enumerate(zip(text, bidiTypes))
+    ]
+    if debug:
+        debug_storage(storage, base_info=True)
 
     explicit_embed_and_overrides(storage, debug)
     resolve_weak_types(storage, debug)
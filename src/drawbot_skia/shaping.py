@@ -1,7 +1,94 @@
-from types import SimpleNamespace
+import threading
+import numpy as np
 import uharfbuzz as hb
 
 
+class ShapingFont(hb.Font):
+
+    """An hb.Font that remembers the state shape() configured it with, so
+    that shape() can skip setting the scale and variations if they didn't
+    change. The scale and variations of a ShapingFont should therefore only
+    be changed by shape().
+    """
+
+    _shapingVariations = None
+
+
+class GlyphRun:
+
+    """The result of shaping a run of text. gids and clusters are arrays,
+    positions is an Nx2 array of glyph positions, and endPos is the pen
+    position after the last glyph. If the text was shaped with fallback
+    fonts, fontIndices is an array with for each glyph the index of its font
+    in the font chain, else it is None.
+    """
+
+    def __init__(
+        self, gids, clusters, positions, endPos, baseLevel=None, fontIndices=None
+    ):
+        self.gids = gids
+        self.clusters = clusters
+        self.positions = positions
+        self.endPos = endPos
+        self.baseLevel = baseLevel
+        self.fontIndices = fontIndices
+
+    @classmethod
+    def concatenate(cls, glyphRuns):
+        if not glyphRuns:
+            return cls(
+                np.zeros(0, dtype=np.uint16),
+                np.zeros(0, dtype=np.uint32),
+                np.zeros((0, 2)),
+                (0, 0),
+            )
+        fontIndices = None
+        if any(glyphRun.fontIndices is not None for glyphRun in glyphRuns):
+            fontIndicesList = []
+            for glyphRun in glyphRuns:
+                runFontIndices = glyphRun.fontIndices
+                if runFontIndices is None:
+                    runFontIndices = np.zeros(len(glyphRun), dtype=np.uint8)
+                fontIndicesList.append(runFontIndices)
+            fontIndices = np.concatenate(fontIndicesList)
+        return cls(
+            np.concatenate([glyphRun.gids for glyphRun in glyphRuns]),
+            np.concatenate([glyphRun.clusters for glyphRun in glyphRuns]),
+            np.concatenate([glyphRun.positions for glyphRun in glyphRuns]),
+            glyphRuns[-1].endPos,
+            fontIndices=fontIndices,
+        )
+
+    def copy(self):
+        return GlyphRun(
+            self.gids,
+            self.clusters,
+            self.positions,
+            self.endPos,
+            self.baseLevel,
+            self.fontIndices,
+        )
+
+    def iterFontRuns(self):
+        """Yield (fontIndex, start, end) tuples for each range of consecutive
+        glyphs that use the same font.
+        """
+        numGlyphs = len(self)
+        if self.fontIndices is None:
+            if numGlyphs:
+                yield 0, 0, numGlyphs
+            return
+        boundaries = (np.flatnonzero(np.diff(self.fontIndices)) + 1).tolist()
+        starts = [0] + boundaries
+        ends = boundaries + [numGlyphs]
+        for start, end in zip(starts, ends):
+            if start < end:
+                yield int(self.fontIndices[start]), start, end
+
+    def __len__(self):
+        return len(self.gids)
+
+
 def shape(
     font,
     text,
@@ -29,12 +116,9 @@ def shape(
     if flippedCanvas:
         fontScaleY = -fontScaleY
 
-    font.scale = (face.upem, face.upem)
-    font.set_variations(variations)
-
-    hb.ot_font_set_funcs(font)
+    _setUpFont(font, variations)
 
-    buf = hb.Buffer.create()
+    buf = _getBuffer()
     buf.add_str(text)  # add_str() does not accept str subclasses
     buf.guess_segment_properties()
     buf.cluster_level = hb.BufferClusterLevel.MONOTONE_CHARACTERS
@@ -48,28 +132,47 @@ def shape(
 
     hb.shape(font, buf, features)
 
-    gids = [info.codepoint for info in buf.glyph_infos]
-    clusters = [info.cluster + startCluster for info in buf.glyph_infos]
-    positions = []
-    startPosX, startPosY = startPos
-    x = y = 0
-    for pos in buf.glyph_positions:
-        dx, dy, ax, ay = pos.position
-        positions.append(
-            (
-                startPosX + (x + dx) * fontScaleX,
-                startPosY + (y + dy) * fontScaleY,
-            )
-        )
-        x += ax
-        y += ay
-    endPos = startPosX + x * fontScaleX, startPosY + y * fontScaleY
-    return SimpleNamespace(
-        gids=gids,
-        clusters=clusters,
-        positions=positions,
-        endPos=endPos,
-    )
+    infos = buf.glyph_infos
+    numGlyphs = len(infos)
+    gids = np.fromiter((info.codepoint for info in infos), np.uint16, numGlyphs)
+    clusters = np.fromiter((info.cluster for info in infos), np.uint32, numGlyphs)
+    clusters += startCluster
+    # dx, dy, ax, ay for each glyph
+    rawPositions = np.array(
+        [pos.position for pos in buf.glyph_positions], dtype=np.float64
+    ).reshape(numGlyphs, 4)
+    advances = rawPositions[:, 2:]
+    penPositions = np.cumsum(advances, axis=0) - advances
+    fontScale = np.array([fontScaleX, fontScaleY])
+    startPos = np.array(startPos, dtype=np.float64)
+    positions = startPos + (penPositions + rawPositions[:, :2]) * fontScale
+    endPos = startPos + advances.sum(axis=0) * fontScale
+    return GlyphRun(gids, clusters, positions, tuple(endPos.tolist()))
+
+
+def _setUpFont(font, variations):
+    variationsKey = tuple(sorted(variations.items()))
+    if getattr(font, "_shapingVariations", None) == variationsKey:
+        return
+    face = font.face
+    font.scale = (face.upem, face.upem)
+    font.set_variations(variations)
+    hb.ot_font_set_funcs(font)
+    if isinstance(font, ShapingFont):
+        font._shapingVariations = variationsKey
+
+
+_threadLocal = threading.local()
+
+
+def _getBuffer():
+    # Reuse one buffer per thread, rather than creating one for each call
+    buf = getattr(_threadLocal, "buffer", None)
+    if buf is None:
+        buf = _threadLocal.buffer = hb.Buffer.create()
+    else:
+        buf.clear_contents()
+    return buf
 
 
 def alignGlyphPositions(glyphsInfo, align):
@@ -81,13 +184,15 @@ def alignGlyphPositions(glyphsInfo, align):
         xOffset = -textWidth
     elif align == "center":
         xOffset = -textWidth / 2
-    glyphsInfo.positions = [(x + xOffset, y) for x, y in glyphsInfo.positions]
+    if xOffset:
+        # Don't modify the positions array in place, it may be shared
+        glyphsInfo.positions = glyphsInfo.positions + (xOffset, 0)
 
 
 def scalePositions(positions, sx, sy=None):
     if sy is None:
         sy = sx
-    return [(x * sx, y * sy) for x, y in positions]
+    return np.asarray(positions) * (sx, sy)
 
 
 def getFeatures(face, otTableTag):
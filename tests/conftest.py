@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+
+
+fakeFFmpegSource = """\
+import shutil
+import sys
+
+with open(sys.argv[-1], "wb") as f:
+    shutil.copyfileobj(sys.stdin.buffer, f)
+"""
+
+
+@pytest.fixture
+def fakeFFmpeg(tmpdir, monkeypatch):
+    """Replace ffmpeg with a script that writes the raw frames it receives
+    to the output file, so they can be inspected.
+    """
+    if sys.platform == "win32":
+        pytest.skip("needs an executable script")
+    from drawbot_skia import ffmpeg
+
+    fakeFFmpegPath = os.path.join(tmpdir, "fake-ffmpeg")
+    with open(fakeFFmpegPath, "w") as f:
+        f.write(f"#!{sys.executable}\n" + fakeFFmpegSource)
+    os.chmod(fakeFFmpegPath, 0o755)
+    monkeypatch.setattr(ffmpeg, "FFMPEG_PATH", fakeFFmpegPath)
+    return fakeFFmpegPath
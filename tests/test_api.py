@@ -90,11 +90,13 @@ test_data_saveImage = [
     (singlepageSource, "jpg", ["test.jpg"]),
     (singlepageSource, "svg", ["test.svg"]),
     (singlepageSource, "pdf", ["test.pdf"]),
+    (singlepageSource, "skp", ["test.skp"]),
     # (singlepageSource, "mp4", ["test.mp4"]),
     (multipageSource, "png", ["test_0.png", "test_1.png", "test_2.png"]),
     (multipageSource, "jpg", ["test_0.jpg", "test_1.jpg", "test_2.jpg"]),
     (multipageSource, "svg", ["test_0.svg", "test_1.svg", "test_2.svg"]),
     (multipageSource, "pdf", ["test.pdf"]),
+    (multipageSource, "skp", ["test_0.skp", "test_1.skp", "test_2.skp"]),
     # (multipageSource, "mp4", ["test.mp4"]),
 ]
 
@@ -112,6 +114,32 @@ def test_saveImage_multipage(tmpdir, script, imageType, expectedFilenames):
     assert expectedFilenames == [p.name for p in sorted(tmpdir.glob(glob_pattern))]
 
 
+parallelSource = """
+for i in range(7):
+    newPage(200, 200)
+    fill(i / 7, 0.5, 1 - i / 7)
+    oval(20 + i * 10, 30, 100, 120)
+"""
+
+
+@pytest.mark.parametrize("imageType", ["png", "jpg"])
+def test_saveImage_workers(tmpdir, imageType):
+    tmpdir = pathlib.Path(tmpdir)
+    db = Drawing()
+    namespace = makeDrawbotNamespace(db)
+    runScriptSource(parallelSource, "<string>", namespace)
+    (tmpdir / "sequential").mkdir()
+    (tmpdir / "parallel").mkdir()
+    db.saveImage(tmpdir / "sequential" / f"test.{imageType}")
+    db.saveImage(tmpdir / "parallel" / f"test.{imageType}", workers=3)
+    sequentialPaths = sorted((tmpdir / "sequential").iterdir())
+    parallelPaths = sorted((tmpdir / "parallel").iterdir())
+    assert 7 == len(sequentialPaths)
+    assert [p.name for p in sequentialPaths] == [p.name for p in parallelPaths]
+    for sequentialPath, parallelPath in zip(sequentialPaths, parallelPaths):
+        assert sequentialPath.read_bytes() == parallelPath.read_bytes()
+
+
 @pytest.mark.skipif(sys.platform == "darwin", reason="currently broken on macOS")
 def test_saveImage_mp4_codec(tmpdir):
     from drawbot_skia import ffmpeg
@@ -130,6 +158,24 @@ def test_saveImage_mp4_codec(tmpdir):
     assert expectedFilenames == [p.name for p in paths]
 
 
+def test_saveImage_mp4_rawFrames(tmpdir, fakeFFmpeg):
+    tmpdir = pathlib.Path(tmpdir)
+    db = Drawing()
+    namespace = makeDrawbotNamespace(db)
+    runScriptSource(parallelSource, "<string>", namespace)
+    db.saveImage(tmpdir / "test.mp4")
+    db.saveImage(tmpdir / "test.png")
+    assert [] == sorted(tmpdir.glob("frame*"))
+    frames = np.frombuffer((tmpdir / "test.mp4").read_bytes(), dtype=np.uint8)
+    frames = frames.reshape((7, 200, 200, 4))
+    for index, frame in enumerate(frames):
+        assert 255 == frame[..., 3].min()
+        image = Image.open(tmpdir / f"test_{index}.png")
+        background = Image.new("RGBA", image.size, "white")
+        expected = np.asarray(Image.alpha_composite(background, image))
+        assert np.abs(expected.astype(int) - frame).max() <= 1
+
+
 def test_noFont(tmpdir):
     db = Drawing()
     # Ensure we don't get an error when font is not set
@@ -229,3 +275,26 @@ def compareImages(path1, path2):
     if maxDiff < 128:
         return True, "images similar enough"
     return False, f"images differ too much, maxDiff: {maxDiff}"
+
+
+def test_fallbackFont(tmpdir):
+    fontsDir = testDir / "fonts"
+    db = Drawing()
+    db.newPage(400, 100)
+    db.font(fontsDir / "MutatorSans.ttf", 50)
+    txt = "A سلام ㊙"
+    width, _ = db.textSize(txt)
+    db.fallbackFont(
+        fontsDir / "IBMPlexSansArabic-Regular.otf",
+        fontsDir / "TwemojiMozilla.subset.default.3299.ttf",
+    )
+    fallbackWidth, _ = db.textSize(txt)
+    assert fallbackWidth != width
+    db.text(txt, (10, 30))
+    outputPath = pathlib.Path(tmpdir) / "fallbackFont.png"
+    db.saveImage(outputPath)
+    # The COLR glyph from the emoji font is drawn in color
+    pixels = np.asarray(Image.open(outputPath).convert("RGB")).astype(int)
+    assert (pixels[:, :, 0] - pixels[:, :, 1] > 100).any()
+    db.fallbackFont(None)
+    assert () == db._gstate.textStyle.fallbackFonts
@@ -0,0 +1,110 @@
+import pytest
+from drawbot_skia.cache import LRUCache
+
+
+def test_lruCache():
+    cache = LRUCache(2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert 1 == cache.get("a")
+    cache["c"] = 3
+    # "b" was the least recently used item
+    assert "b" not in cache
+    assert "a" in cache
+    assert "c" in cache
+    assert 2 == len(cache)
+    assert None is cache.get("b")
+    assert (1, 1, 2, 2, 1) == tuple(cache.cacheInfo())[:5]
+    cache.clear()
+    assert (0, 0, 2, 0, 0) == tuple(cache.cacheInfo())[:5]
+
+
+def test_lruCache_disabled():
+    cache = LRUCache(0)
+    cache["a"] = 1
+    assert 0 == len(cache)
+    assert "default" == cache.get("a", "default")
+
+
+def test_lruCache_unbounded():
+    cache = LRUCache(None)
+    for i in range(1000):
+        cache[i] = i
+    assert 1000 == len(cache)
+
+
+def test_lruCache_maxBytes():
+    cache = LRUCache(None, maxBytes=10, sizeFunc=len)
+    cache["a"] = "aaaa"
+    cache["b"] = "bbbb"
+    assert 8 == cache.cacheInfo().currbytes
+    cache.get("a")
+    cache["c"] = "cccc"
+    assert "b" not in cache
+    assert "a" in cache
+    assert "c" in cache
+    cacheInfo = cache.cacheInfo()
+    assert (1, 10, 8) == (cacheInfo.evictions, cacheInfo.maxbytes, cacheInfo.currbytes)
+    # Replacing an item doesn't count its old size
+    cache["c"] = "cc"
+    assert 6 == cache.cacheInfo().currbytes
+    # The most recent item is kept, even if it is over budget by itself
+    cache["d"] = "d" * 20
+    assert "d" in cache
+    assert 1 == len(cache)
+    assert 20 == cache.cacheInfo().currbytes
+    assert 3 == cache.cacheInfo().evictions
+
+
+def test_lruCache_sizeFuncError():
+    def sizeFunc(value):
+        if value is None:
+            raise ValueError("no size")
+        return len(value)
+
+    cache = LRUCache(None, maxBytes=10, sizeFunc=sizeFunc)
+    cache["a"] = "aaaa"
+    with pytest.raises(ValueError):
+        cache["b"] = None
+    with pytest.raises(ValueError):
+        cache["a"] = None
+    assert "b" not in cache
+    assert "aaaa" == cache.get("a")
+    assert 4 == cache.cacheInfo().currbytes
+
+
+def test_lruCache_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = LRUCache(50, maxBytes=200, sizeFunc=len)
+
+    def work(offset):
+        for i in range(2000):
+            key = (offset + i) % 100
+            if cache.get(key) is None:
+                cache[key] = "x" * (key % 10 + 1)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(work, range(4)))
+    cacheInfo = cache.cacheInfo()
+    assert cacheInfo.currsize <= 50
+    assert cacheInfo.currbytes == sum(len(cache.get(key)) for key in list(cache._items))
+    assert 8000 == cacheInfo.hits + cacheInfo.misses
+
+
+def test_lruCache_resize():
+    cache = LRUCache(4, sizeFunc=len)
+    for key in "abcd":
+        cache[key] = key * 3
+    cache.get("a")
+    cache.resize(2)
+    assert ["a", "d"] == [key for key in "abcd" if key in cache]
+    assert 6 == cache.cacheInfo().currbytes
+    cache.resize(None, maxBytes=3)
+    assert ["a"] == [key for key in "abcd" if key in cache]
+    assert (None, 3) == (cache.maxSize, cache.maxBytes)
+    cache.resize(0)
+    assert 0 == len(cache)
+    assert 0 == cache.cacheInfo().currbytes
+    cache["e"] = "e"
+    assert 0 == len(cache)
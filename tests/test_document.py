@@ -1,6 +1,20 @@
+import os
 import pathlib
+import numpy as np
 import pytest
-from drawbot_skia.document import PDFDocument
+import skia
+from PIL import Image
+from drawbot_skia import document
+from drawbot_skia.document import (
+    MP4Document,
+    PDFDocument,
+    PixelDocument,
+    RasterDocument,
+    RecordingDocument,
+    SurfacePool,
+    SVGDocument,
+)
+from drawbot_skia.drawing import Drawing
 
 
 def test_pdf_document(tmpdir):
@@ -21,3 +35,351 @@ def test_pdf_document_error(tmpdir):
             db.newPage(400, 500)
             db.rect(100, 100, 200, 300)
             1 / 0
+
+
+def _drawPages(db, numPages):
+    for i in range(numPages):
+        db.newPage(200, 150)
+        db.fill(i / numPages, 0.5, 0)
+        db.oval(20 + i * 10, 30, 100, 80)
+
+
+@pytest.mark.parametrize("numPages", [1, 3])
+@pytest.mark.parametrize("imageType", ["png", "jpg"])
+def test_pixel_document(tmpdir, imageType, numPages):
+    tmpdir = pathlib.Path(tmpdir)
+    (tmpdir / "recorded").mkdir()
+    (tmpdir / "streamed").mkdir()
+    db = Drawing()
+    _drawPages(db, numPages)
+    db.saveImage(tmpdir / "recorded" / f"test.{imageType}")
+    doc = PixelDocument(tmpdir / "streamed" / f"test.{imageType}")
+    with doc.drawing() as db:
+        _drawPages(db, numPages)
+    recordedPaths = sorted((tmpdir / "recorded").iterdir())
+    streamedPaths = sorted((tmpdir / "streamed").iterdir())
+    assert numPages == len(streamedPaths)
+    assert [p.name for p in recordedPaths] == [p.name for p in streamedPaths]
+    for recordedPath, streamedPath in zip(recordedPaths, streamedPaths):
+        assert recordedPath.read_bytes() == streamedPath.read_bytes()
+
+
+@pytest.mark.parametrize("numPages", [1, 3])
+def test_svg_document(tmpdir, numPages):
+    tmpdir = pathlib.Path(tmpdir)
+    (tmpdir / "recorded").mkdir()
+    (tmpdir / "streamed").mkdir()
+    db = Drawing()
+    _drawPages(db, numPages)
+    db.saveImage(tmpdir / "recorded" / "test.svg")
+    doc = SVGDocument(tmpdir / "streamed" / "test.svg")
+    with doc.drawing() as db:
+        _drawPages(db, numPages)
+    recordedPaths = sorted((tmpdir / "recorded").iterdir())
+    streamedPaths = sorted((tmpdir / "streamed").iterdir())
+    assert numPages == len(streamedPaths)
+    assert [p.name for p in recordedPaths] == [p.name for p in streamedPaths]
+    for recordedPath, streamedPath in zip(recordedPaths, streamedPaths):
+        assert recordedPath.read_bytes() == streamedPath.read_bytes()
+        assert streamedPath.read_text().rstrip().endswith("</svg>")
+
+
+@pytest.mark.parametrize("workers", [None, 3])
+def test_tiled_png(tmpdir, workers):
+    tmpdir = pathlib.Path(tmpdir)
+    db = Drawing()
+    db.newPage(150, 230)
+    for i in range(10):
+        db.fill(i / 10, 0.5, 0, 0.75)
+        db.rect(i * 10, i * 20, 60, 45)
+    db.saveImage(tmpdir / "test.png")
+    db.saveImage(tmpdir / "tiled.png", tileSize=32, workers=workers)
+    image = np.asarray(Image.open(tmpdir / "test.png"))
+    tiled = np.asarray(Image.open(tmpdir / "tiled.png"))
+    assert (230, 150, 4) == tiled.shape
+    assert (image == tiled).all()
+    db.saveImage(tmpdir / "large.png", scale=2)
+    db.saveImage(tmpdir / "tiledLarge.png", scale=2, tileSize=64)
+    image = np.asarray(Image.open(tmpdir / "large.png"))
+    tiled = np.asarray(Image.open(tmpdir / "tiledLarge.png"))
+    assert (460, 300, 4) == tiled.shape
+    assert (image == tiled).all()
+    with pytest.raises(ValueError):
+        db.saveImage(tmpdir / "tiled.jpg", tileSize=32)
+
+
+def test_pageImages(tmpdir):
+    tmpdir = pathlib.Path(tmpdir)
+    db = Drawing()
+    for i in range(3):
+        db.newPage(200, 150)
+        db.fill(1)
+        db.rect(0, 0, 200, 150)
+        db.fill(i / 3, 0.5, 0)
+        db.oval(20 + i * 10, 30, 100, 80)
+    images = db.pageImages()
+    db.saveImage(tmpdir / "test.png")
+    for index, image in enumerate(images):
+        assert (150, 200, 4) == image.shape
+        assert np.uint8 == image.dtype
+        expected = np.asarray(Image.open(tmpdir / f"test_{index}.png"))
+        # The PNG was rendered in the native color type, which may cause
+        # rounding differences
+        assert np.abs(expected.astype(int) - image).max() <= 1
+    assert index == 2
+
+    document = db._document
+    image = document.renderPage(1, scale=0.5)
+    assert (75, 100, 4) == image.shape
+    image = document.renderPage(1, colorType=skia.kRGBA_F32_ColorType)
+    assert (150, 200, 4) == image.shape
+    assert np.float32 == image.dtype
+    assert 1.0 == image.max()
+    image = document.renderPage(1, colorType=skia.kAlpha_8_ColorType)
+    assert (150, 200) == image.shape
+    assert 255 == image.min()
+    with pytest.raises(ValueError):
+        document.renderPage(1, colorType=skia.kARGB_4444_ColorType)
+
+
+def test_scaledPageSize(tmpdir):
+    # A scaled page size that isn't a whole number of pixels gets the same
+    # pixel size from every way of rendering the page
+    tmpdir = pathlib.Path(tmpdir)
+    db = Drawing()
+    db.newPage(150, 150)
+    db.fill(0.5, 0, 1)
+    db.rect(0, 0, 150, 150)
+    scale = 0.25  # 37.5 pixels
+    db.saveImage(tmpdir / "test.png", scale=scale)
+    db.saveImage(tmpdir / "tiled.png", scale=scale, tileSize=16)
+    expected = np.asarray(Image.open(tmpdir / "test.png"))
+    assert (37, 37, 4) == expected.shape
+    image = db._document.renderPage(0, scale=scale)
+    assert np.abs(expected.astype(int) - image).max() <= 1
+    assert (37, 37, 4) == np.asarray(Image.open(tmpdir / "tiled.png")).shape
+    rasterDB = Drawing(RasterDocument())
+    rasterDB.newPage(150, 150)
+    (image,) = rasterDB.pageImages(scale=scale)
+    assert (37, 37, 4) == image.shape
+
+
+def test_raster_document(tmpdir):
+    tmpdir = pathlib.Path(tmpdir)
+    (tmpdir / "recorded").mkdir()
+    (tmpdir / "raster").mkdir()
+    recordedDB = Drawing()
+    _drawPages(recordedDB, 3)
+    recordedDB.saveImage(tmpdir / "recorded" / "test.png")
+    recordedDB.saveImage(tmpdir / "recorded" / "test.jpg")
+    db = Drawing(RasterDocument())
+    _drawPages(db, 3)
+    db.saveImage(tmpdir / "raster" / "test.png")
+    db.saveImage(tmpdir / "raster" / "test.jpg")
+    recordedPaths = sorted((tmpdir / "recorded").iterdir())
+    rasterPaths = sorted((tmpdir / "raster").iterdir())
+    assert 6 == len(rasterPaths)
+    assert [p.name for p in recordedPaths] == [p.name for p in rasterPaths]
+    for recordedPath, rasterPath in zip(recordedPaths, rasterPaths):
+        if recordedPath.suffix == ".png":
+            assert recordedPath.read_bytes() == rasterPath.read_bytes()
+    images = list(db.pageImages(whiteBackground=True))
+    assert 3 == len(images)
+    for index, image in enumerate(images):
+        assert (150, 200, 4) == image.shape
+        assert 255 == image[..., 3].min()
+        expected = recordedDB._document.renderPage(index, whiteBackground=True)
+        # Compositing on white afterwards may cause rounding differences
+        assert np.abs(expected.astype(int) - image).max() <= 1
+    images = list(db.pageImages(scale=0.5))
+    assert 3 == len(images)
+    assert (75, 100, 4) == images[0].shape
+    db.saveImages(
+        [
+            (tmpdir / "raster" / "small.png", dict(scale=0.5)),
+            (tmpdir / "raster" / "small.jpg", dict(scale=0.5, quality=50)),
+            (tmpdir / "raster" / "white.png", dict(whiteBackground=True)),
+        ]
+    )
+    assert (100, 75) == Image.open(tmpdir / "raster" / "small_0.png").size
+    assert (100, 75) == Image.open(tmpdir / "raster" / "small_0.jpg").size
+    white = np.asarray(Image.open(tmpdir / "raster" / "white_0.png"))
+    assert 255 == white[..., 3].min()
+    with pytest.raises(ValueError):
+        db.saveImage(tmpdir / "test.svg")
+    with pytest.raises(TypeError):
+        db.saveImage(tmpdir / "test.png", compression=3)
+
+
+@pytest.mark.parametrize("numPages", [1, 3])
+def test_recording_document_fromSKP(tmpdir, numPages):
+    tmpdir = pathlib.Path(tmpdir)
+    db = Drawing()
+    _drawPages(db, numPages)
+    db.saveImage(tmpdir / "test.skp")
+    db.saveImage(tmpdir / "original.png")
+    document = RecordingDocument.fromSKP(tmpdir / "test.skp", [0.5] * numPages)
+    assert [0.5] * numPages == document._frameDurations
+    Drawing(document).saveImage(tmpdir / "loaded.png")
+    originalPaths = sorted(tmpdir.glob("original*.png"))
+    loadedPaths = sorted(tmpdir.glob("loaded*.png"))
+    assert numPages == len(loadedPaths)
+    for originalPath, loadedPath in zip(originalPaths, loadedPaths):
+        assert originalPath.read_bytes() == loadedPath.read_bytes()
+    with pytest.raises(ValueError):
+        RecordingDocument.fromSKP(tmpdir / "test.skp", [0.5, 0.5, 0.5, 0.5])
+    with pytest.raises(FileNotFoundError):
+        RecordingDocument.fromSKP(tmpdir / "missing.skp")
+
+
+@pytest.mark.parametrize("workers", [None, 3])
+def test_saveImages(tmpdir, fakeFFmpeg, workers):
+    tmpdir = pathlib.Path(tmpdir)
+    (tmpdir / "single").mkdir()
+    (tmpdir / "multi").mkdir()
+    db = Drawing()
+    _drawPages(db, 3)
+    for suffix in ["png", "svg", "skp", "mp4"]:
+        db.saveImage(tmpdir / "single" / f"test.{suffix}")
+    db.saveImages(
+        [
+            tmpdir / "multi" / "test.png",
+            (tmpdir / "multi" / "large.png", dict(scale=2)),
+            (tmpdir / "multi" / "thumb.jpg", dict(scale=0.25, quality=80)),
+            tmpdir / "multi" / "test.svg",
+            tmpdir / "multi" / "test.skp",
+            tmpdir / "multi" / "test.pdf",
+            tmpdir / "multi" / "test.mp4",
+        ],
+        workers=workers,
+    )
+    for path in sorted((tmpdir / "single").iterdir()):
+        assert path.read_bytes() == (tmpdir / "multi" / path.name).read_bytes()
+    assert (400, 300) == Image.open(tmpdir / "multi" / "large_2.png").size
+    assert (50, 37) == Image.open(tmpdir / "multi" / "thumb_1.jpg").size
+    assert (tmpdir / "multi" / "test.pdf").read_bytes().startswith(b"%PDF")
+    with pytest.raises(ValueError):
+        db.saveImages([tmpdir / "test.gif"])
+    with pytest.raises(TypeError):
+        db.saveImages([(tmpdir / "test.svg", dict(scale=2))])
+
+
+def _drawRepeatedPages(db, pageColors):
+    for color in pageColors:
+        db.newPage(200, 150)
+        db.fill(*color)
+        db.oval(20, 30, 100, 80)
+
+
+repeatedPageColors = [(1, 0, 0), (1, 0, 0), (0, 0, 1), (1, 0, 0), (0, 0, 1)]
+
+
+def test_saveImage_repeatedPages(tmpdir, fakeFFmpeg, monkeypatch):
+    tmpdir = pathlib.Path(tmpdir)
+    renderedPages = []
+    originalRenderPicture = document._renderPicture
+
+    def _renderPicture(picture, *args, **kwargs):
+        renderedPages.append(picture)
+        return originalRenderPicture(picture, *args, **kwargs)
+
+    monkeypatch.setattr(document, "_renderPicture", _renderPicture)
+    db = Drawing()
+    _drawRepeatedPages(db, repeatedPageColors)
+    db.saveImage(tmpdir / "test.png")
+    assert 5 == len(renderedPages)
+    renderedPages.clear()
+    db.saveImage(tmpdir / "test.png", reuseRepeatedPages=True)
+    assert 2 == len(renderedPages)
+    paths = [tmpdir / f"test_{index}.png" for index in range(5)]
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+    assert paths[0].read_bytes() == paths[3].read_bytes()
+    assert paths[2].read_bytes() == paths[4].read_bytes()
+    assert paths[0].read_bytes() != paths[2].read_bytes()
+    # Repeated pages are copies, not links
+    assert not os.path.samefile(paths[0], paths[1])
+
+    renderedPages.clear()
+    db.saveImage(tmpdir / "test.mp4", reuseRepeatedPages=True)
+    assert 2 == len(renderedPages)
+    frames = np.frombuffer((tmpdir / "test.mp4").read_bytes(), dtype=np.uint8)
+    frames = frames.reshape((5, 150, 200, 4))
+    for index, color in enumerate(repeatedPageColors):
+        assert color == tuple(frames[index, 75, 70, :3] // 255)
+
+    renderedPages.clear()
+    db.saveImages([tmpdir / "multi.png", tmpdir / "multi.svg"], reuseRepeatedPages=True)
+    assert 2 == len(renderedPages)
+    svgPaths = [tmpdir / f"multi_{index}.svg" for index in range(5)]
+    assert svgPaths[0].read_bytes() == svgPaths[3].read_bytes()
+    assert not os.path.samefile(svgPaths[0], svgPaths[3])
+
+
+@pytest.mark.parametrize("suffix", ["png", "jpg", "svg", "skp"])
+def test_saveImage_replacesFiles(tmpdir, suffix):
+    # Saving replaces existing files, instead of writing into them, so files
+    # that are hard links to them are left alone
+    tmpdir = pathlib.Path(tmpdir)
+    db = Drawing()
+    _drawRepeatedPages(db, repeatedPageColors)
+    db.saveImage(tmpdir / f"test.{suffix}")
+    paths = [tmpdir / f"test_{index}.{suffix}" for index in range(5)]
+    data = [path.read_bytes() for path in paths]
+    linkPath = tmpdir / f"link.{suffix}"
+    os.link(paths[1], linkPath)
+    db.newPage(200, 150)
+    db.saveImage(tmpdir / f"test.{suffix}")
+    assert data[1] == linkPath.read_bytes()
+    assert not os.path.samefile(paths[1], linkPath)
+    # No temporary files are left behind
+    expectedNames = [f"link.{suffix}"] + [f"test_{i}.{suffix}" for i in range(6)]
+    assert expectedNames == sorted(path.name for path in tmpdir.iterdir())
+
+
+def test_pixel_document_unsupported(tmpdir):
+    with pytest.raises(ValueError):
+        PixelDocument(pathlib.Path(tmpdir) / "test.gif")
+
+
+def test_mp4_document(tmpdir, fakeFFmpeg):
+    tmpdir = pathlib.Path(tmpdir)
+    db = Drawing()
+    _drawPages(db, 5)
+    db.saveImage(tmpdir / "recorded.mp4")
+    doc = MP4Document(tmpdir / "streamed.mp4")
+    with doc.drawing() as db:
+        _drawPages(db, 5)
+    recorded = (tmpdir / "recorded.mp4").read_bytes()
+    streamed = (tmpdir / "streamed.mp4").read_bytes()
+    assert 5 * 200 * 150 * 4 == len(streamed)
+    assert recorded == streamed
+    frames = np.frombuffer(streamed, dtype=np.uint8).reshape((5, 150, 200, 4))
+    assert (255, 255, 255, 255) == tuple(frames[0, 0, 0])
+
+
+def test_surfacePool():
+    # Room for two 800 byte surfaces
+    pool = SurfacePool(maxBytes=1600, maxSurfaceBytes=1000)
+    info1 = skia.ImageInfo.MakeN32Premul(20, 10)
+    info2 = skia.ImageInfo.MakeN32Premul(10, 20)
+    surface1 = pool.acquire(info1)
+    surface2 = pool.acquire(info1)
+    assert surface1 is not surface2
+    pool.release(surface1)
+    assert surface1 is pool.acquire(info1)
+    assert 0 == len(pool)
+    pool.release(surface1)
+    pool.release(surface2)
+    surface3 = pool.acquire(info2)
+    assert (10, 20) == (surface3.width(), surface3.height())
+    pool.release(surface3)
+    assert 2 == len(pool)
+    # surface1 was the least recently used surface, and was discarded
+    assert surface2 is pool.acquire(info1)
+    assert surface1 is not pool.acquire(info1)
+    assert 800 == pool.currentBytes
+    # Surfaces that are too large aren't pooled
+    pool.release(pool.acquire(skia.ImageInfo.MakeN32Premul(40, 40)))
+    assert (1, 800) == (len(pool), pool.currentBytes)
+    pool.clear()
+    assert (0, 0) == (len(pool), pool.currentBytes)
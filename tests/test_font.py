@@ -1,12 +1,28 @@
 import os
 import pathlib
+import pytest
 import skia
-from drawbot_skia.font import makeTTFontFromSkiaTypeface
-from drawbot_skia.gstate import GraphicsState
+from drawbot_skia.font import (
+    makeHBFaceFromPath,
+    makeHBFaceFromSkiaTypeface,
+    makeTTFontFromPath,
+    makeTTFontFromSkiaTypeface,
+)
+from drawbot_skia.gstate import (
+    GraphicsState,
+    TextStyle,
+    DEFAULT_FONT_CACHE_BYTES,
+    DEFAULT_FONT_CACHE_SIZE,
+    clearFontCache,
+    getCacheInfo,
+    setCacheSize,
+    setVariationQuantization,
+)
 
 
 testDir = pathlib.Path(__file__).resolve().parent
 fontPath = testDir / "fonts" / "MutatorSans.ttf"
+fontPath2 = testDir / "fonts" / "SourceSerifPro-Regular.otf"
 
 
 def test_font():
@@ -18,6 +34,17 @@ def test_font():
     assert ["name", "fvar"] == list(ttf.tables.keys())
 
 
+def test_font_fromPath():
+    ttf = makeTTFontFromPath(fontPath)
+    assert ttf["name"].getName(6, 3, 1).toUnicode() == "MutatorMathTest-LightCondensed"
+    assert ["name"] == list(ttf.tables.keys())
+    skTypeface = skia.Typeface.MakeFromFile(os.fspath(fontPath))
+    hbFace = makeHBFaceFromPath(os.fspath(fontPath))
+    hbFaceFromSkia = makeHBFaceFromSkiaTypeface(skTypeface)
+    assert hbFaceFromSkia.upem == hbFace.upem
+    assert hbFaceFromSkia.glyph_count == hbFace.glyph_count
+
+
 def test_font_gs():
     gs = GraphicsState()
     gs.font(fontPath)
@@ -62,3 +89,66 @@ def test_listNamedInstances():
     namedInstances = gs.listNamedInstances()
     assert mutatorsans_instances == namedInstances
     assert list(mutatorsans_instances) == list(namedInstances)
+
+
+def test_typefaceCache():
+    clearFontCache()
+    textStyle = TextStyle(font=fontPath, variations={"wght": 500})
+    typeface1 = textStyle.skFont.getTypeface()
+    # Same location, with the default wdth value spelled out
+    textStyle2 = textStyle.copy(fontSize=20, variations={"wght": 500, "wdth": 0})
+    assert typeface1 is textStyle2.skFont.getTypeface()
+    # Out of range values are clamped
+    textStyle3 = textStyle.copy(variations={"wght": 5000})
+    textStyle4 = textStyle.copy(variations={"wght": 1000})
+    assert textStyle3.skFont.getTypeface() is textStyle4.skFont.getTypeface()
+    cacheInfo = getCacheInfo("typeface")
+    assert (2, 2, 2) == (cacheInfo.hits, cacheInfo.misses, cacheInfo.currsize)
+    clearFontCache()
+
+
+def test_variationQuantization():
+    clearFontCache()
+    textStyle = TextStyle(font=fontPath, variations={"wght": 503})
+    textStyle2 = textStyle.copy(variations={"wght": 497})
+    assert textStyle.skFont.getTypeface() is not textStyle2.skFont.getTypeface()
+    try:
+        setVariationQuantization(10)
+        textStyle = textStyle.copy()
+        textStyle2 = textStyle2.copy()
+        assert textStyle.skFont.getTypeface() is textStyle2.skFont.getTypeface()
+    finally:
+        setVariationQuantization(None)
+    clearFontCache()
+
+
+def test_fontCache():
+    try:
+        setCacheSize("font", 1)
+        TextStyle(font=fontPath).ttFont
+        TextStyle(font=fontPath).ttFont
+        cacheInfo = getCacheInfo("font")
+        assert (1, 1, 0) == (cacheInfo.hits, cacheInfo.misses, cacheInfo.evictions)
+        assert os.path.getsize(fontPath) > cacheInfo.currbytes > 0
+        TextStyle(font=fontPath2).ttFont
+        cacheInfo = getCacheInfo("font")
+        assert (1, 2, 1) == (cacheInfo.hits, cacheInfo.misses, cacheInfo.evictions)
+        assert 1 == cacheInfo.currsize
+        setCacheSize("font", None, maxBytes=os.path.getsize(fontPath2))
+        TextStyle(font=fontPath).ttFont
+        TextStyle(font=fontPath2).ttFont
+        cacheInfo = getCacheInfo("font")
+        assert (0, 2, 1) == (cacheInfo.hits, cacheInfo.misses, cacheInfo.evictions)
+    finally:
+        setCacheSize("font", DEFAULT_FONT_CACHE_SIZE, DEFAULT_FONT_CACHE_BYTES)
+
+
+def test_cacheInfo():
+    for name in ["shaping", "textBlob", "glyphPath", "colorGlyph", "font", "typeface"]:
+        assert 7 == len(getCacheInfo(name))
+    with pytest.raises(ValueError):
+        getCacheInfo("unknown")
+    with pytest.raises(ValueError):
+        setCacheSize("unknown", 10)
+    with pytest.raises(ValueError):
+        setCacheSize("textBlob", 10, maxBytes=1000)
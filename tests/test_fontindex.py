@@ -0,0 +1,99 @@
+import os
+import pathlib
+import shutil
+from fontTools.ttLib import TTCollection, TTFont
+from drawbot_skia import fontindex
+from drawbot_skia.fontindex import FontIndex, codePointRanges
+from drawbot_skia.gstate import TextStyle, setFontIndex
+
+
+testDir = pathlib.Path(__file__).resolve().parent
+fontsDir = testDir / "fonts"
+
+
+def _makeFontFolder(tmpdir):
+    fontFolder = pathlib.Path(tmpdir) / "fonts"
+    (fontFolder / "sub").mkdir(parents=True)
+    shutil.copy(fontsDir / "MutatorSans.ttf", fontFolder)
+    shutil.copy(fontsDir / "IBMPlexSansArabic-Regular.otf", fontFolder / "sub")
+    collection = TTCollection()
+    collection.fonts = [
+        TTFont(fontsDir / "SourceSerifPro-Regular.otf"),
+        TTFont(fontsDir / "Nabla.subset.ttf"),
+    ]
+    collection.save(fontFolder / "collection.ttc")
+    (fontFolder / "notAFont.txt").write_text("hello")
+    (fontFolder / "broken.ttf").write_text("hello")
+    return fontFolder
+
+
+def test_fontIndex(tmpdir):
+    fontFolder = _makeFontFolder(tmpdir)
+    index = FontIndex([fontFolder])
+    index.update()
+    assert 4 == len(index.files)
+    assert [] == index.files[os.fspath(fontFolder / "broken.ttf")]["faces"]
+    collectionPath = os.fspath(fontFolder / "collection.ttc")
+    assert (collectionPath, 0) == index.lookUp("SourceSerifPro-Regular")
+    assert (collectionPath, 1) == index.lookUp("Nabla-Normal")
+    assert (collectionPath, 1) == index.lookUp("Nabla Normal")
+    assert (collectionPath, 0) == index.lookUp("Source Serif Pro")
+    plexPath = os.fspath(fontFolder / "sub" / "IBMPlexSansArabic-Regular.otf")
+    assert (plexPath, 0) == index.lookUp("IBMPlexSansArabic")
+    assert None is index.lookUp("Helvetica")
+    faces = {face["postscriptName"]: face for face in index.faces()}
+    mutator = faces["MutatorMathTest-LightCondensed"]
+    assert {"wdth": [0, 0, 1000], "wght": [0, 0, 1000]} == mutator["axes"]
+    assert [32, 32] == mutator["coverage"][0]
+
+
+def test_fontIndex_persistent(tmpdir, monkeypatch):
+    fontFolder = _makeFontFolder(tmpdir)
+    indexPath = pathlib.Path(tmpdir) / "index.json"
+    index = FontIndex([fontFolder], indexPath)
+    index.update()
+    assert indexPath.exists()
+
+    readPaths = []
+    originalReadFaceInfo = fontindex.readFaceInfo
+
+    def readFaceInfo(fontPath):
+        readPaths.append(fontPath)
+        return originalReadFaceInfo(fontPath)
+
+    monkeypatch.setattr(fontindex, "readFaceInfo", readFaceInfo)
+    index = FontIndex([fontFolder], indexPath)
+    index.update()
+    assert [] == readPaths
+    assert index.lookUp("MutatorMathTest-LightCondensed") is not None
+
+    mutatorPath = fontFolder / "MutatorSans.ttf"
+    stat = os.stat(mutatorPath)
+    os.utime(mutatorPath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    os.remove(fontFolder / "collection.ttc")
+    index = FontIndex([fontFolder], indexPath)
+    index.update()
+    assert [os.fspath(mutatorPath)] == readPaths
+    assert None is index.lookUp("Nabla-Normal")
+    assert 3 == len(FontIndex([fontFolder], indexPath).files)
+
+
+def test_fontIndex_textStyle(tmpdir):
+    fontFolder = _makeFontFolder(tmpdir)
+    index = FontIndex([fontFolder])
+    index.update()
+    try:
+        setFontIndex(index)
+        textStyle = TextStyle(font="Nabla-Normal")
+        collectionPath = os.fspath(fontFolder / "collection.ttc")
+        assert (collectionPath, 1) == textStyle.fontObjects.fontFile
+        assert "Nabla Normal" == textStyle.skFont.getTypeface().getFamilyName()
+        assert "COLR" in textStyle.ttFont
+        assert textStyle.hbFont.face.upem == textStyle.ttFont["head"].unitsPerEm
+    finally:
+        setFontIndex(None)
+
+
+def test_codePointRanges():
+    assert [] == codePointRanges([])
+    assert [[1, 3], [5, 5], [7, 8]] == codePointRanges([8, 1, 2, 3, 5, 7])
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+
+# Modules that are slow to import, and that should only be imported when
+# they are needed
+lazyModules = [
+    "blackrenderer",
+    "bidi",
+    "drawbot_skia.ffmpeg",
+    "drawbot_skia.font",
+    "drawbot_skia.segmenting",
+    "drawbot_skia.shaping",
+    "fontTools.ttLib",
+    "hashlib",
+    "numpy",
+    "pathops",
+    "shutil",
+    "uharfbuzz",
+    "unicodedata2",
+]
+
+# The maximum time in seconds that importing drawbot_skia.drawbot may take,
+# not counting the import of skia itself. Currently it takes about 0.08 s, so
+# this fails when a heavy module is imported at import time again. On slower
+# machines, the budget grows with the import time of skia, measured in the
+# same run: drawbot_skia takes about 2.5 times as long as skia to import.
+importTimeBudget = 0.12
+importTimeFactor = 3
+
+
+def _runPython(source):
+    result = subprocess.run(
+        [sys.executable, "-c", source], capture_output=True, check=True, text=True
+    )
+    return result.stdout
+
+
+def test_import_lazyModules():
+    source = "import sys, drawbot_skia.drawbot; print(' '.join(sys.modules))"
+    importedModules = set(_runPython(source).split())
+    assert [] == [name for name in lazyModules if name in importedModules]
+
+
+def test_import_timeBudget():
+    source = (
+        "import time; t = time.perf_counter(); import skia; "
+        "skiaTime = time.perf_counter() - t; t = time.perf_counter(); "
+        "import drawbot_skia.drawbot; print(skiaTime, time.perf_counter() - t)"
+    )
+    times = [[float(t) for t in _runPython(source).split()] for i in range(3)]
+    skiaImportTime = min(skiaTime for skiaTime, importTime in times)
+    importTime = min(importTime for skiaTime, importTime in times)
+    assert importTime < max(importTimeBudget, importTimeFactor * skiaImportTime)
@@ -1,6 +1,13 @@
+import pathlib
+import pytest
+from drawbot_skia.gstate import TextStyle, clearFontCache, getCacheInfo
 from drawbot_skia.path import BezierPath
 
 
+testDir = pathlib.Path(__file__).resolve().parent
+mutatorFontPath = testDir / "fonts" / "MutatorSans.ttf"
+
+
 def test_path_bounds():
     path = BezierPath()
     assert path.bounds() is None
@@ -36,3 +43,23 @@ def test_path_point_args():
 def test_path_line_args():
     path1 = BezierPath()
     path1.line([0, 0], [0, 100])
+
+
+def test_path_text():
+    clearFontCache()
+    path1 = BezierPath()
+    path1.text("HAHA", (10, 20), font=mutatorFontPath, fontSize=100)
+    cacheInfo = getCacheInfo("glyphPath")
+    assert (0, 2, 2) == (cacheInfo.hits, cacheInfo.misses, cacheInfo.currsize)
+    path2 = BezierPath()
+    path2.text("HAHA", (20, 40), font=mutatorFontPath, fontSize=200)
+    cacheInfo = getCacheInfo("glyphPath")
+    assert (2, 2, 2) == (cacheInfo.hits, cacheInfo.misses, cacheInfo.currsize)
+    bounds1 = path1.bounds()
+    bounds2 = path2.bounds()
+    assert bounds2 == pytest.approx([2 * v for v in bounds1])
+    skFont = TextStyle(font=mutatorFontPath, fontSize=100).skFont
+    glyphBounds = skFont.getPath(skFont.textToGlyphs("H")[0]).computeTightBounds()
+    assert bounds1[0] == pytest.approx(10 + glyphBounds.left())
+    assert bounds1[1] == pytest.approx(20 - glyphBounds.bottom())
+    clearFontCache()
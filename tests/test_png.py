@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from PIL import Image
+from drawbot_skia.png import PNGWriter
+
+
+def test_pngWriter(tmpdir):
+    path = tmpdir / "test.png"
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 256, (23, 17, 4), dtype=np.uint8)
+    with PNGWriter(path, 17, 23) as writer:
+        writer.writeRows(pixels[:10].tobytes())
+        writer.writeRows(pixels[10:])
+    image = Image.open(path)
+    assert "RGBA" == image.mode
+    assert (17, 23) == image.size
+    assert (pixels == np.asarray(image)).all()
+
+
+def test_pngWriter_rowCount(tmpdir):
+    path = tmpdir / "test.png"
+    with pytest.raises(ValueError):
+        with PNGWriter(path, 3, 2) as writer:
+            writer.writeRows(bytes(3 * 4))
+    with pytest.raises(ValueError):
+        with PNGWriter(path, 3, 2) as writer:
+            writer.writeRows(bytes(3 * 3 * 4))
@@ -1,5 +1,14 @@
 import pytest
-from drawbot_skia.segmenting import textSegments, reorderedSegments
+from drawbot_skia import segmenting
+from drawbot_skia.font import makeCoverageBitset
+from drawbot_skia.segmenting import (
+    _fullTextSegments,
+    _simpleTextSegments,
+    detectScript,
+    fallbackFontIndices,
+    reorderedSegments,
+    textSegments,
+)
 
 
 arabicText = " أحدث "
@@ -70,3 +79,85 @@ def test_reorderedSegments():
         (6, "Latn", 0, 22),
     ]
     assert expectedReordered == reordered
+
+
+simpleTexts = [
+    "",
+    " ",
+    "123",
+    latinText,
+    "(hello) [world]",
+    "a\u0301 \u200dtest\t1.5%",
+    "\u00abd\u00e9j\u00e0 vu\u00bb",
+    "\u041f\u0440\u0438\u0432\u0435\u0442!",
+]
+
+
+@pytest.mark.parametrize("text", simpleTexts)
+def test_simpleTextSegments(text):
+    segments = _simpleTextSegments(text)
+    assert segments is not None
+    assert _fullTextSegments(text) == (segments, 0)
+
+
+notSimpleTexts = [
+    arabicText,
+    hebrewText,
+    latinText + arabicText,
+    "hello \u041f\u0440\u0438\u0432\u0435\u0442",
+    "\u202ehello",
+]
+
+
+@pytest.mark.parametrize("text", notSimpleTexts)
+def test_simpleTextSegments_fallback(text):
+    assert _simpleTextSegments(text) is None
+    assert textSegments(text) == _fullTextSegments(text)
+
+
+detectScriptTexts = [
+    "",
+    " ",
+    latinText,
+    latinText + arabicText + hebrewText + latinText,
+    "(\u05d0) a)\u0301 b]",
+    " \u0301) " + arabicText + "(]",
+    "\U0001F600 abc \U00010330\U00010331 ",
+]
+
+
+@pytest.mark.parametrize("text", detectScriptTexts)
+def test_detectScript_vectorized(text, monkeypatch):
+    expected = detectScript(text)
+    monkeypatch.setattr(segmenting, "VECTORIZE_MIN_LENGTH", 0)
+    assert expected == detectScript(text)
+
+
+def test_textSegments_vectorized(monkeypatch):
+    text = (latinText + arabicText + hebrewText + latinText) * 20
+    expected = textSegments(text)
+    monkeypatch.setattr(segmenting, "VECTORIZE_MIN_LENGTH", 0)
+    assert expected == textSegments(text)
+
+
+fallbackFontIndicesTestData = [
+    ("", []),
+    ("abc", [0, 0, 0]),
+    ("aXb", [0, 1, 0]),
+    ("aZb", [0, 0, 0]),  # not covered by any font
+    ("XYX", [1, 2, 1]),
+    ("X\u0301a\u0301", [1, 1, 0, 0]),  # marks follow their base
+    ("\u0301a", [0, 0]),
+    ("X\U0001F600", [1, 2]),
+]
+
+
+@pytest.mark.parametrize("testString, expectedFontIndices", fallbackFontIndicesTestData)
+def test_fallbackFontIndices(testString, expectedFontIndices):
+    coverages = [
+        makeCoverageBitset(map(ord, "abc\u0301")),
+        makeCoverageBitset(map(ord, "X")),
+        makeCoverageBitset([ord("X"), ord("Y"), 0x1F600]),
+    ]
+    fontIndices = fallbackFontIndices(testString, coverages)
+    assert expectedFontIndices == fontIndices.tolist()
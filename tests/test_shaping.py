@@ -1,15 +1,26 @@
 import os
 import pathlib
+import numpy as np
 import pytest
 import skia
 import uharfbuzz as hb
-from drawbot_skia.gstate import makeHBFaceFromSkiaTypeface
-from drawbot_skia.shaping import shape
+from drawbot_skia.gstate import (
+    DEFAULT_COLORGLYPH_CACHE_SIZE,
+    DEFAULT_TEXTBLOB_CACHE_SIZE,
+    TextStyle,
+    clearFontCache,
+    getCacheInfo,
+    makeHBFaceFromSkiaTypeface,
+    setCacheSize,
+)
+from drawbot_skia.shaping import GlyphRun, ShapingFont, alignGlyphPositions, shape
 
 
 testDir = pathlib.Path(__file__).resolve().parent
 mutatorFontPath = testDir / "fonts" / "MutatorSans.ttf"
 plexFontPath = testDir / "fonts" / "IBMPlexSansArabic-Regular.otf"
+nablaFontPath = testDir / "fonts" / "Nabla.subset.ttf"
+emojiFontPath = testDir / "fonts" / "TwemojiMozilla.subset.default.3299.ttf"
 
 
 shapeTestCases = [
@@ -95,7 +106,151 @@ def test_shape(
         script=script,
     )
     expectedGids, expectedClusters, expectedPositions, expectedEndPos = expected
-    assert expectedGids == glyphInfo.gids
-    assert expectedClusters == glyphInfo.clusters
-    assert expectedPositions == glyphInfo.positions
+    assert expectedGids == glyphInfo.gids.tolist()
+    assert expectedClusters == glyphInfo.clusters.tolist()
+    assert expectedPositions == [tuple(pos) for pos in glyphInfo.positions.tolist()]
     assert expectedEndPos == glyphInfo.endPos
+
+
+def test_shapingCache():
+    clearFontCache()
+    textStyle = TextStyle(font=mutatorFontPath, fontSize=100)
+    glyphsInfo1 = textStyle.shape("ABC")
+    cacheInfo = getCacheInfo("shaping")
+    assert (0, 1) == (cacheInfo.hits, cacheInfo.misses)
+    # A copy with a property that doesn't affect shaping should hit the cache
+    glyphsInfo2 = textStyle.copy(lineHeight=150).shape("ABC")
+    cacheInfo = getCacheInfo("shaping")
+    assert (1, 1) == (cacheInfo.hits, cacheInfo.misses)
+    assert glyphsInfo1 is not glyphsInfo2
+    assert glyphsInfo1.positions.tolist() == glyphsInfo2.positions.tolist()
+    textStyle.copy(fontSize=50).shape("ABC")
+    cacheInfo = getCacheInfo("shaping")
+    assert (1, 2) == (cacheInfo.hits, cacheInfo.misses)
+    clearFontCache()
+    assert 0 == getCacheInfo("shaping").currsize
+
+
+def test_textBlobCache():
+    clearFontCache()
+    textStyle = TextStyle(font=mutatorFontPath, fontSize=100)
+    blob1 = textStyle.makeTextBlob("ABC")
+    blob2 = textStyle.copy(lineHeight=150).makeTextBlob("ABC")
+    assert blob1 is blob2
+    blob3 = textStyle.makeTextBlob("ABC", align="center")
+    assert blob1 is not blob3
+    assert blob3.bounds().width() == pytest.approx(blob1.bounds().width())
+    assert blob3.bounds().left() < blob1.bounds().left()
+    cacheInfo = getCacheInfo("textBlob")
+    assert (1, 2, 2) == (cacheInfo.hits, cacheInfo.misses, cacheInfo.currsize)
+    try:
+        setCacheSize("textBlob", 0)
+        blob4 = textStyle.makeTextBlob("ABC")
+        assert blob4 is not blob1
+        assert 0 == getCacheInfo("textBlob").currsize
+    finally:
+        setCacheSize("textBlob", DEFAULT_TEXTBLOB_CACHE_SIZE)
+    clearFontCache()
+
+
+def test_colorGlyphCache():
+    clearFontCache()
+    textStyle = TextStyle(font=nablaFontPath, fontSize=100)
+    black = (0, 0, 0, 1)
+    picture1 = textStyle.getColorGlyphPicture("A", black)
+    picture2 = textStyle.copy(fontSize=50).getColorGlyphPicture("A", black)
+    assert picture1 is picture2
+    assert picture1.approximateOpCount() > 0
+    picture3 = textStyle.getColorGlyphPicture("A", (1, 0, 0, 1))
+    assert picture1 is not picture3
+    varStyle = textStyle.copy(variations={"wght": 700})
+    picture4 = varStyle.getColorGlyphPicture("A", black)
+    assert picture1 is not picture4
+    assert picture1.cullRect() != picture4.cullRect()
+    cacheInfo = getCacheInfo("colorGlyph")
+    assert (1, 3, 3) == (cacheInfo.hits, cacheInfo.misses, cacheInfo.currsize)
+    # The shared BlackRendererFont must be reset to the default location after
+    # drawing at another location
+    setCacheSize("colorGlyph", DEFAULT_COLORGLYPH_CACHE_SIZE)
+    picture5 = textStyle.getColorGlyphPicture("A", black)
+    assert picture1.cullRect() == picture5.cullRect()
+    clearFontCache()
+
+
+def test_shape_fallbackFonts():
+    textStyle = TextStyle(font=mutatorFontPath, fontSize=100)
+    txt = "AB \u0633\u0644\u0627\u0645 \u3299 a"
+    glyphsInfo = textStyle.shape(txt)
+    assert glyphsInfo.fontIndices is None
+    assert 0 in glyphsInfo.gids.tolist()  # .notdef
+    fallbackStyle = textStyle.copy(fallbackFonts=(plexFontPath, emojiFontPath))
+    glyphsInfo = fallbackStyle.shape(txt)
+    assert 0 not in glyphsInfo.gids.tolist()
+    # Arabic is reordered and ligated, the a isn't in MutatorSans
+    expectedFontIndices = [0, 0, 0, 1, 1, 1, 0, 2, 0, 1]
+    assert expectedFontIndices == glyphsInfo.fontIndices.tolist()
+    expectedFontRuns = [(0, 0, 3), (1, 3, 6), (0, 6, 7), (2, 7, 8), (0, 8, 9), (1, 9, 10)]
+    assert expectedFontRuns == list(glyphsInfo.iterFontRuns())
+    xPositions = glyphsInfo.positions[:, 0].tolist()
+    assert xPositions == sorted(xPositions)
+    blob = fallbackStyle.makeTextBlob(txt)
+    assert blob.bounds().width() > textStyle.makeTextBlob("AB").bounds().width()
+
+
+def test_glyphRun_iterFontRuns():
+    glyphRun = GlyphRun.concatenate([])
+    assert [] == list(glyphRun.iterFontRuns())
+    glyphRun = GlyphRun(np.zeros(4, dtype=np.uint16), None, None, None)
+    assert [(0, 0, 4)] == list(glyphRun.iterFontRuns())
+    glyphRun.fontIndices = np.array([1, 1, 0, 2], dtype=np.uint8)
+    assert [(1, 0, 2), (0, 2, 3), (2, 3, 4)] == list(glyphRun.iterFontRuns())
+
+
+def test_shape_shapingFont():
+    tf = skia.Typeface.MakeFromFile(os.fspath(mutatorFontPath))
+    face = makeHBFaceFromSkiaTypeface(tf)
+    shapingFont = ShapingFont(face)
+    locations = [{}, {"wght": 1000}, {"wght": 1000}, {"wdth": 500}, {}]
+    for variations in locations:
+        expected = shape(hb.Font(face), "ABC", variations=variations)
+        glyphInfo = shape(shapingFont, "ABC", variations=variations)
+        assert expected.positions.tolist() == glyphInfo.positions.tolist()
+        assert expected.endPos == glyphInfo.endPos
+
+
+def test_glyphRun_concatenate():
+    tf = skia.Typeface.MakeFromFile(os.fspath(mutatorFontPath))
+    hbFont = hb.Font(makeHBFaceFromSkiaTypeface(tf))
+    run1 = shape(hbFont, "AB")
+    run2 = shape(hbFont, "C", startPos=run1.endPos, startCluster=2)
+    glyphRun = GlyphRun.concatenate([run1, run2])
+    expected = shape(hbFont, "ABC")
+    assert expected.gids.tolist() == glyphRun.gids.tolist()
+    assert expected.clusters.tolist() == glyphRun.clusters.tolist()
+    assert expected.positions.tolist() == glyphRun.positions.tolist()
+    assert expected.endPos == glyphRun.endPos
+    glyphRun.baseLevel = 0
+    alignGlyphPositions(glyphRun, "center")
+    assert [-671, 0] == glyphRun.positions[0].tolist()
+    assert [0, 0] == expected.positions[0].tolist()
+
+
+def test_glyphRun_concatenate_empty():
+    glyphRun = GlyphRun.concatenate([])
+    assert 0 == len(glyphRun)
+    assert (0, 0) == glyphRun.endPos
+
+
+def test_shape_woff(tmpdir):
+    from fontTools.ttLib import TTFont
+
+    # HarfBuzz can't read WOFF files by itself: their tables go through Skia
+    woffPath = pathlib.Path(tmpdir) / "MutatorSans.woff"
+    ttFont = TTFont(mutatorFontPath)
+    ttFont.flavor = "woff"
+    ttFont.save(woffPath)
+    expected = TextStyle(font=mutatorFontPath, fontSize=100).shape("ABC")
+    glyphsInfo = TextStyle(font=woffPath, fontSize=100).shape("ABC")
+    assert [1, 2, 3] == glyphsInfo.gids.tolist()
+    assert expected.positions.tolist() == glyphsInfo.positions.tolist()
+    assert expected.endPos == glyphsInfo.endPos